@@ -1,35 +1,101 @@
-from flask import Flask, request, send_file, jsonify, render_template
+from flask import Flask, Response, request, send_file, jsonify, redirect, render_template, stream_with_context, url_for
 from flask_cors import CORS
+import contextlib
 import os
-import requests
-from pydub import AudioSegment
-import random
-from openai import OpenAI
+import threading
+import uuid
 from dotenv import load_dotenv
+from jobs import JobQueue, QueueFullError
+from warm_pool import WarmPool
+from artifacts import ArtifactStore
+from cache import ResultCache, cache_key
+import metrics
+from providers import ClientFactory, Provider, SpeechClient, StoryClient, require_api_key
 
-load_dotenv()
-
-# Retrieve API keys
-XI_API_KEY = os.getenv("XI_API_KEY")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# pydub, NumPy and the provider SDKs are imported where they are first used, so the app starts quickly;
+# see benchmarks/bench_import_time.py
 
-# Validate API keys
-if not OPENAI_API_KEY:
-    raise ValueError("OpenAI API key not found in environment variables.")
-if not XI_API_KEY:
-    raise ValueError("ElevenLabs API key not found in environment variables.")
+load_dotenv()
 
 # Important constants
 VOICE_ID = "t7VcunDELSXwqBUqGfc7"
+VOICE_SETTINGS = {
+    "stability": 0.98,
+    "similarity_boost": 0.95,
+    "style": 0.0,
+    "use_speaker_boost": True
+}
+STORY_MODEL = "gpt-4o"
+STORY_TEMPERATURE = 0.9
 STORY_WORD_COUNT = 700  # Desired length of the horror story
+UNTITLED_STORY_NAME = "Unknown Story"  # Title used in the prompt when the request doesn't give one
 OUTPUT_TTS_PATH = "story_tts.mp3"
-CHUNK_SIZE = 1024  # Size of chunks to read/write at a time
 
 BACKGROUND_MUSIC_FOLDER = "background_music/"
 FINAL_OUTPUT_AUDIO_PATH = "final_output_audio.mp3"
 
-# Initialize OpenAI API
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Generated files live in the artifact store; each job gets its own working folder
+ARTIFACT_FOLDER = os.getenv("ARTIFACT_FOLDER", "artifacts/")
+ARTIFACT_TTL_SECONDS = int(os.getenv("ARTIFACT_TTL_SECONDS", 24 * 3600))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", 2 * 1024 ** 3))
+# Artifact URLs are named after the content hash, so browsers may keep them for as long as they like
+ARTIFACT_CACHE_MAX_AGE = int(os.getenv("ARTIFACT_CACHE_MAX_AGE", 365 * 24 * 3600))
+
+# Job queue sizing
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", 16))
+STREAM_SLOTS = int(os.getenv("STREAM_SLOTS", 4))  # Concurrent /stream responses
+
+# Stories and narrations are cached by their request parameters; pass "fresh" to bypass the lookup
+CACHE_FOLDER = os.getenv("CACHE_FOLDER", "cache/")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 7 * 24 * 3600))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 1024 ** 3))
+
+# Long stories are narrated in chunks synthesized in parallel; 0 sends the whole story in one request
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", 1000))
+TTS_CHUNK_WORKERS = int(os.getenv("TTS_CHUNK_WORKERS", 4))
+TTS_CHUNK_SILENCE_MS = int(os.getenv("TTS_CHUNK_SILENCE_MS", 250))  # Pause inserted between chunks
+TTS_CHUNK_RETRIES = int(os.getenv("TTS_CHUNK_RETRIES", 1))  # On top of the provider's own retries below
+
+# Narrations at least this long are mixed block by block straight to MP3, so memory stays flat; 0 streams every mix
+STREAMING_MIX_SECONDS = float(os.getenv("STREAMING_MIX_SECONDS", 600))
+# How far the music dips under speech; it comes back up in the pauses. 0 keeps one fixed level.
+MUSIC_DUCK_DB = float(os.getenv("MUSIC_DUCK_DB", 6))
+
+# Finished stories kept ready for requests without a title; 0 turns the pool off.
+# Entries must expire well before their artifacts do (ARTIFACT_TTL_SECONDS).
+WARM_POOL_SIZE = int(os.getenv("WARM_POOL_SIZE", 0))
+WARM_POOL_MAX_AGE_SECONDS = int(os.getenv("WARM_POOL_MAX_AGE_SECONDS", 6 * 3600))
+WARM_POOL_WORKERS = int(os.getenv("WARM_POOL_WORKERS", 1))
+
+# Provider endpoints; point these at local stubs (see fake_providers.py) to run offline
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # None means the official OpenAI endpoint
+ELEVENLABS_API_URL = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io/v1")
+
+# Provider call limits; connection pools are sized to match. Transient errors (429/5xx) are retried.
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", JOB_WORKERS + STREAM_SLOTS))
+OPENAI_REQUESTS_PER_SECOND = float(os.getenv("OPENAI_REQUESTS_PER_SECOND", 0)) or None
+ELEVENLABS_MAX_CONCURRENCY = int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", JOB_WORKERS * TTS_CHUNK_WORKERS))
+ELEVENLABS_REQUESTS_PER_SECOND = float(os.getenv("ELEVENLABS_REQUESTS_PER_SECOND", 0)) or None
+PROVIDER_RETRIES = int(os.getenv("PROVIDER_RETRIES", 3))
+TTS_HEDGE_AFTER = float(os.getenv("TTS_HEDGE_AFTER", 0)) or None  # Seconds before a slow TTS call is duplicated
+
+# Clients are built, and the API keys checked, on first use
+story_client = ClientFactory(lambda: StoryClient(
+    require_api_key("OPENAI_API_KEY", "OpenAI"), OPENAI_BASE_URL,
+    Provider("openai", max_concurrency=OPENAI_MAX_CONCURRENCY,
+             requests_per_second=OPENAI_REQUESTS_PER_SECOND, retries=PROVIDER_RETRIES)))
+speech_client = ClientFactory(lambda: SpeechClient(
+    require_api_key("XI_API_KEY", "ElevenLabs"), ELEVENLABS_API_URL,
+    Provider("elevenlabs", max_concurrency=ELEVENLABS_MAX_CONCURRENCY,
+             requests_per_second=ELEVENLABS_REQUESTS_PER_SECOND, retries=PROVIDER_RETRIES,
+             hedge_after=TTS_HEDGE_AFTER)))
+
+artifact_store = ArtifactStore(ARTIFACT_FOLDER, ttl_seconds=ARTIFACT_TTL_SECONDS, max_bytes=ARTIFACT_MAX_BYTES)
+story_cache = ResultCache(os.path.join(CACHE_FOLDER, "stories"), memory_bytes=8 * 1024 ** 2,
+                          max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS)
+tts_cache = ResultCache(os.path.join(CACHE_FOLDER, "tts"), memory_bytes=128 * 1024 ** 2,
+                        max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS)
 
 app = Flask(__name__)
 CORS(app)
@@ -39,96 +105,319 @@ CORS(app)
 def index():
     return render_template('index.html')
 
-# Existing route to generate story
-@app.route('/generate', methods=['POST'])
-def generate():
-    data = request.get_json()
-    story_name = data.get('story_name', 'Unknown Story')
-    
+def run_story_job(job):
+    """
+    Runs the full story pipeline for a queued job and returns the artifact id of the mixed audio.
+    """
+    metrics.QUEUE_WAIT_SECONDS.observe(job.started_at - job.created_at)
+    job.trace = metrics.Trace()
+    with metrics.tracing(job.trace):
+        return produce_story_audio(job.id, job.params["story_name"], fresh=job.params["fresh"], stage=job.stage)
+
+def produce_story_audio(work_id, story_name, voice_id=VOICE_ID, word_count=STORY_WORD_COUNT, fresh=False,
+                        stage=None):
+    """
+    Writes, narrates and mixes one story in its own working folder and returns the artifact id of the audio.
+    `stage(name)`, if given, wraps each step (see Job.stage).
+    """
+    stage = stage or (lambda name: contextlib.nullcontext())
+    job_folder = artifact_store.job_dir(work_id)
+    tts_path = os.path.join(job_folder, OUTPUT_TTS_PATH)
+    final_path = os.path.join(job_folder, FINAL_OUTPUT_AUDIO_PATH)
+
     try:
         # Generate the horror story
-        story = generate_horror_story(story_name, word_count=STORY_WORD_COUNT)
+        with stage("story"):
+            story = generate_horror_story(story_name, word_count=word_count, fresh=fresh)
 
         # Convert the story to speech
-        text_to_speech(story, OUTPUT_TTS_PATH, VOICE_ID)
+        with stage("tts"):
+            text_to_speech(story, tts_path, voice_id, fresh=fresh)
 
         # Mix the audio with background music
-        mix_audio(tts_path=OUTPUT_TTS_PATH,
-                  music_folder=BACKGROUND_MUSIC_FOLDER,
-                  output_path=FINAL_OUTPUT_AUDIO_PATH)
+        with stage("mix"):
+            mix_audio(tts_path=tts_path,
+                      music_folder=BACKGROUND_MUSIC_FOLDER,
+                      output_path=final_path)
+
+        return artifact_store.commit(final_path)
+    finally:
+        artifact_store.release_job(work_id)
+
+def produce_pooled_story(bucket):
+    # Untitled, so the story is never cached and every pooled request gets a new one
+    voice_id, word_count = bucket
+    return produce_story_audio(f"pool-{uuid.uuid4().hex}", "", voice_id, word_count, fresh=True)
+
+job_queue = JobQueue(run_story_job, max_workers=JOB_WORKERS, max_queue_depth=JOB_QUEUE_DEPTH)
+stream_slots = threading.BoundedSemaphore(STREAM_SLOTS)
+warm_pool = WarmPool(produce_pooled_story, [(VOICE_ID, STORY_WORD_COUNT)], size=WARM_POOL_SIZE,
+                     max_age=WARM_POOL_MAX_AGE_SECONDS, workers=WARM_POOL_WORKERS,
+                     is_valid=lambda artifact_id: artifact_store.path(artifact_id) is not None)
+
+def pipeline_gauges():
+    queue = job_queue.stats()
+    yield "story_jobs_queued", "gauge", "Jobs waiting for a worker.", [({}, queue["queued"])]
+    yield "story_jobs_running", "gauge", "Jobs being processed.", [({}, queue["running"])]
+    caches = {"stories": story_cache.stats(), "tts": tts_cache.stats()}
+    yield "story_cache_memory_bytes", "gauge", "Bytes held by the in-memory result caches.", [
+        ({"cache": name}, stats["memory_bytes"]) for name, stats in caches.items()]
+    yield "story_cache_hit_ratio", "gauge", "Result cache hit rate since startup.", [
+        ({"cache": name}, stats["hit_rate"]) for name, stats in caches.items()]
+    pool = warm_pool.stats()
+    yield "story_pool_ready", "gauge", "Finished stories waiting in the warm pool.", [
+        ({"bucket": bucket}, count) for bucket, count in pool["ready"].items()]
+    yield "story_pool_hit_ratio", "gauge", "Share of untitled requests served from the warm pool.", [
+        ({}, pool["hit_rate"])]
 
-        # Send the final audio file back to the client
-        return send_file(FINAL_OUTPUT_AUDIO_PATH, mimetype='audio/mpeg')
+metrics.registry.register_collector(pipeline_gauges)
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return jsonify({'error': str(e)}), 500
+@app.before_request
+def start_warm_pool():
+    # On the first request rather than at import, so startup stays fast and the pool fills under any WSGI server
+    if WARM_POOL_SIZE:
+        warm_pool.start()
+
+# Prometheus scrape endpoint
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify({'stories': story_cache.stats(), 'tts': tts_cache.stats(), 'pool': warm_pool.stats()})
+
+# Queue a story generation job and return its id right away
+@app.route('/generate', methods=['POST'])
+def generate():
+    data = request.get_json()
+    story_name = (data.get('story_name') or '').strip()
+    fresh = bool(data.get('fresh', False))
 
-def generate_horror_story(story_name, word_count=700):
+    # "Any scary story" is answered from the warm pool when one is ready
+    if not story_name and WARM_POOL_SIZE:
+        artifact_id = warm_pool.take((VOICE_ID, STORY_WORD_COUNT))
+        if artifact_id is not None:
+            job = job_queue.add_done({'story_name': story_name, 'fresh': fresh, 'pooled': True}, artifact_id)
+            return jsonify(job_payload(job)), 200
+
+    try:
+        job = job_queue.submit({'story_name': story_name, 'fresh': fresh})
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 429
+
+    return jsonify(job_payload(job)), 202
+
+def job_payload(job, include_trace=False):
+    data = job.to_dict(include_trace=include_trace)
+    if job.status == 'done':
+        data['audio_url'] = url_for('artifact', artifact_id=job.result)
+    return data
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    # ?trace=1 adds the per-stage spans and counters recorded for this job
+    include_trace = request.args.get('trace', '').lower() in ('1', 'true', 'yes')
+    return jsonify(job_payload(job, include_trace=include_trace))
+
+@app.route('/jobs/<job_id>/audio')
+def job_audio(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status != 'done':
+        return jsonify(job_payload(job)), 409
+    if artifact_store.path(job.result) is None:
+        return jsonify({'error': 'Audio has expired'}), 410
+    # The job URL changes per request; the artifact URL is stable and cacheable
+    return redirect(url_for('artifact', artifact_id=job.result))
+
+# Generated files by content hash, with ETag, Range and conditional GET support
+@app.route('/artifacts/<artifact_id>')
+def artifact(artifact_id):
+    path = artifact_store.path(artifact_id)
+    if path is None:
+        return jsonify({'error': 'Artifact not found or expired'}), 404
+    etag = artifact_id.partition('.')[0]
+    response = send_file(path, etag=etag, conditional=True, max_age=ARTIFACT_CACHE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+# Stream a story as MP3 while it is still being written and narrated
+@app.route('/stream')
+def stream():
+    story_name = request.args.get('story_name', '').strip()
+    fresh = request.args.get('fresh', '').lower() in ('1', 'true', 'yes')
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many streams in progress'}), 429
+
+    def generate_audio():
+        from music_library import get_music_library
+        from streaming import stream_story_audio
+
+        try:
+            track = get_music_library(BACKGROUND_MUSIC_FOLDER).choose()
+            yield from stream_story_audio(stream_horror_story(story_name, word_count=STORY_WORD_COUNT, fresh=fresh),
+                                          lambda text: synthesize_speech(text, VOICE_ID, fresh=fresh),
+                                          track.audio, music_dBFS=track.dBFS)
+        except Exception as e:
+            print(f"An error occurred while streaming: {e}")
+
+    response = Response(stream_with_context(generate_audio()), mimetype='audio/mpeg')
+    response.call_on_close(stream_slots.release)
+    return response
+
+def story_messages(story_name, word_count):
     prompt = (
         f"""Write a first-person, bone-chilling, atmospheric horror story titled "{story_name}" centered around a paranormal activity occurrence in exactly {word_count} words. The story should start with a very relatable scenario, such as a person settling in for the night after a long day, or staying in a remote cabin for a weekend getaway. Then, something paranormal or sinister happens, like hearing footsteps in the attic or seeing a shadowy figure outside the window. Focus on setting the scene in a quiet, isolated home at night, where every creak and shadow feeds into the protagonist's growing fear. Incorporate eerie, sensory details like the sound of footsteps in the dark, the glint of light on unfamiliar objects, or whispers from unseen corners. The intruder's presence should be felt throughout the narrative, creating an overwhelming sense of helplessness and terror. The protagonist eventually confronts the intruder, leading to a chilling climax that leaves the reader with a lingering sense of dread. The protagonist is alive and is able to report to the police. However, the intruder is never caught and is said to be still lingering around for the next victim. The story should be suitable for audio narration, ensuring every word adds to the suspense and ultimate horror of the protagonist's fate."""
     )
+    return [
+        {"role": "system", "content": "You are a creative and imaginative writer specializing in horror stories."},
+        {"role": "user", "content": prompt}
+    ]
+
+def story_cache_key(story_name, word_count):
+    # Untitled requests ask for any story, so they get a new one every time instead of a cached one
+    if not story_name:
+        return None
+    return cache_key("story", story_name, word_count, STORY_MODEL, STORY_TEMPERATURE)
 
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are a creative and imaginative writer specializing in horror stories."},
-            {"role": "user", "content": prompt}
-        ],
+@metrics.stage("story")
+def generate_horror_story(story_name, word_count=700, fresh=False):
+    key = story_cache_key(story_name, word_count)
+    if key is not None and not fresh:
+        cached = story_cache.get(key)
+        metrics.record_cache("story", cached is not None)
+        if cached is not None:
+            return cached.decode("utf-8")
+
+    story = story_client().complete(
+        model=STORY_MODEL,
+        messages=story_messages(story_name or UNTITLED_STORY_NAME, word_count),
         max_tokens=1500,  # Adjusted for 300 words
-        temperature=0.9,
+        temperature=STORY_TEMPERATURE,
     )
-
-    story = response.choices[0].message.content
+    metrics.record_bytes("openai", len(story.encode("utf-8")))
+    if key is not None:
+        story_cache.put(key, story.encode("utf-8"))
     return story
 
-def text_to_speech(text, output_path, voice_id, model_id="eleven_multilingual_v2"):
-    tts_url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream"
-
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "xi-api-key": XI_API_KEY
-    }
-
-    data = {
-        "text": text,
-        "model_id": model_id,
-        "voice_settings": {
-            "stability": 0.98,
-            "similarity_boost": 0.95,
-            "style": 0.0,
-            "use_speaker_boost": True
-        }
-    }
-
-    response = requests.post(tts_url, headers=headers, json=data, stream=True)
-
-    if response.ok:
+def stream_horror_story(story_name, word_count=700, fresh=False):
+    """
+    Same as generate_horror_story, but yields the text piece by piece as the model writes it.
+    """
+    key = story_cache_key(story_name, word_count)
+    if key is not None and not fresh:
+        cached = story_cache.get(key)
+        metrics.record_cache("story", cached is not None)
+        if cached is not None:
+            yield cached.decode("utf-8")
+            return
+
+    parts = []
+    for delta in story_client().stream(
+        model=STORY_MODEL,
+        messages=story_messages(story_name or UNTITLED_STORY_NAME, word_count),
+        max_tokens=1500,
+        temperature=STORY_TEMPERATURE,
+    ):
+        parts.append(delta)
+        yield delta
+    story = "".join(parts).encode("utf-8")
+    metrics.record_bytes("openai", len(story))
+    if key is not None:
+        story_cache.put(key, story)
+
+def speech_cache_key(text, voice_id, model_id):
+    return cache_key("tts", text, voice_id, model_id, VOICE_SETTINGS)
+
+@metrics.stage("tts")
+def text_to_speech(text, output_path, voice_id, model_id="eleven_multilingual_v2", fresh=False):
+    key = speech_cache_key(text, voice_id, model_id)
+    cached = None if fresh else tts_cache.get(key)
+    if not fresh:
+        metrics.record_cache("tts", cached is not None)
+    if cached is not None:
         with open(output_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-                if chunk:
-                    f.write(chunk)
+            f.write(cached)
+        print("TTS audio loaded from cache.")
+        return
+
+    if TTS_CHUNK_CHARS and len(text) > TTS_CHUNK_CHARS:
+        # Each chunk goes through synthesize_speech, so chunks are cached and retried individually
+        from chunked_tts import chunked_speech
+
+        audio = chunked_speech(text, lambda chunk: synthesize_speech(chunk, voice_id, model_id, fresh=fresh),
+                               max_chars=TTS_CHUNK_CHARS, max_workers=TTS_CHUNK_WORKERS,
+                               silence_ms=TTS_CHUNK_SILENCE_MS, retries=TTS_CHUNK_RETRIES)
+        with metrics.audio_codec("encode"):
+            audio.export(output_path, format="mp3")
+        # Also kept whole, so a repeat skips decoding and stitching the chunks again
+        with open(output_path, "rb") as f:
+            tts_cache.put(key, f.read())
         print("TTS audio saved successfully.")
-    else:
-        raise Exception(f"ElevenLabs TTS API Error: {response.text}")
+        return
 
+    audio = speech_client().speech(text, voice_id, model_id, VOICE_SETTINGS)
+    with open(output_path, "wb") as f:
+        f.write(audio)
+    metrics.record_bytes("elevenlabs", len(audio))
+    tts_cache.put(key, audio)
+    print("TTS audio saved successfully.")
+
+def synthesize_speech(text, voice_id, model_id="eleven_multilingual_v2", fresh=False):
+    """
+    Returns the synthesized audio for `text` as bytes instead of writing it to a file.
+    """
+    key = speech_cache_key(text, voice_id, model_id)
+    if not fresh:
+        cached = tts_cache.get(key)
+        metrics.record_cache("tts", cached is not None)
+        if cached is not None:
+            return cached
+
+    audio = speech_client().speech(text, voice_id, model_id, VOICE_SETTINGS)
+    metrics.record_bytes("elevenlabs", len(audio))
+    tts_cache.put(key, audio)
+    return audio
+
+@metrics.stage("mix")
 def mix_audio(tts_path, music_folder, output_path):
-    tts_audio = AudioSegment.from_file(tts_path)
-
-    music_files = [file for file in os.listdir(music_folder) if file.lower().endswith(('.mp3', '.wav', '.ogg', '.flac', '.m4a'))]
-    if not music_files:
-        raise Exception("No background music files found.")
-    chosen_music_file = os.path.join(music_folder, random.choice(music_files))
-    background_music = AudioSegment.from_file(chosen_music_file)
-
-    total_duration = len(tts_audio) + 5000
-    background_music = (background_music * ((total_duration // len(background_music)) + 1))[:total_duration]
-    background_music += (tts_audio.dBFS - background_music.dBFS - 12)
-    mixed_audio = background_music.overlay(tts_audio)
-    mixed_audio = mixed_audio.fade_out(6000)
-    mixed_audio.export(output_path, format='mp3')
+    from pydub import AudioSegment
+    from music_library import get_music_library
+    from mixing import mix_files, mix_tracks, probe_audio
+
+    # Decoded, measured and pre-looped once per track by the music library
+    track = get_music_library(music_folder).choose()
+    narration = probe_audio(tts_path)
+    if not STREAMING_MIX_SECONDS or narration["seconds"] >= STREAMING_MIX_SECONDS:
+        with metrics.audio_codec("streaming_mix"):
+            narration_seconds, mixed_seconds = mix_files(tts_path, track, output_path, gain_offset_db=-12,
+                                                         tail_ms=5000, fade_ms=6000, duck_db=MUSIC_DUCK_DB,
+                                                         narration=narration)
+        metrics.record_audio("narration", narration_seconds)
+        metrics.record_audio("mixed", mixed_seconds)
+        print("Mixed audio exported successfully.")
+        return
+
+    with metrics.audio_codec("decode"):
+        tts_audio = AudioSegment.from_file(tts_path)
+    metrics.record_audio("narration", len(tts_audio) / 1000)
+
+    # Loop, gain (-12 dB under the narration), overlay and fade in one vectorized pass
+    mixed_audio = mix_tracks(tts_audio, track, gain_offset_db=-12, tail_ms=5000, fade_ms=6000, duck_db=MUSIC_DUCK_DB)
+    with metrics.audio_codec("encode"):
+        mixed_audio.export(output_path, format='mp3')
+    metrics.record_audio("mixed", len(mixed_audio) / 1000)
     print("Mixed audio exported successfully.")
 
 if __name__ == "__main__":
+    # Fail at startup rather than on the first request when a key is missing
+    story_client()
+    speech_client()
+    if WARM_POOL_SIZE:
+        warm_pool.start()
     app.run(debug=True)
\ No newline at end of file
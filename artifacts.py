@@ -0,0 +1,142 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+CHUNK_SIZE = 1024 * 1024  # Size of chunks to read at a time while hashing
+
+
+class ArtifactStore:
+    """
+    Keeps generated files on disk so concurrent runs never share a path.
+
+    Every run works inside its own folder under `<root>/jobs/<job_id>/`. When a file is
+    finished, commit() moves it into `<root>/objects/` under the SHA-256 of its content
+    with an atomic rename, so readers only ever see complete files.
+    Committed objects are removed once they are older than `ttl_seconds`, or oldest first
+    once the store grows past `max_bytes`. None turns either limit off; with both off, nothing is ever removed.
+    """
+    def __init__(self, root="artifacts/", ttl_seconds=24 * 3600, max_bytes=2 * 1024 ** 3, gc_interval=60):
+        self.root = os.path.abspath(root)
+        self.jobs_folder = os.path.join(self.root, "jobs")
+        self.objects_folder = os.path.join(self.root, "objects")
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.gc_interval = gc_interval
+        self._last_gc = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(self.jobs_folder, exist_ok=True)
+        os.makedirs(self.objects_folder, exist_ok=True)
+
+    def job_dir(self, job_id):
+        path = os.path.join(self.jobs_folder, job_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def release_job(self, job_id):
+        shutil.rmtree(os.path.join(self.jobs_folder, job_id), ignore_errors=True)
+
+    def commit(self, path):
+        """
+        Moves a finished file into the store and returns its artifact id (content hash + extension).
+        """
+        digest = _sha256_file(path)
+        extension = os.path.splitext(path)[1].lower()
+        artifact_id = digest + extension
+        target = self._object_path(artifact_id)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        with self._lock:
+            try:
+                # Same content was produced before; keep the existing copy and refresh its age
+                os.utime(target)
+                os.remove(path)
+            except FileNotFoundError:
+                # Not there yet, or another process collected it a moment ago
+                os.replace(path, target)
+
+        try:
+            self.maybe_collect_garbage()
+        except Exception as e:
+            # The file is committed either way; a failed sweep is retried on a later commit
+            print(f"Artifact garbage collection failed: {e}")
+        return artifact_id
+
+    def path(self, artifact_id):
+        """
+        Returns the absolute path of a committed artifact, or None if it is unknown or expired.
+        """
+        if not _is_valid_artifact_id(artifact_id):
+            return None
+        target = self._object_path(artifact_id)
+        return target if os.path.exists(target) else None
+
+    def maybe_collect_garbage(self):
+        if self.ttl_seconds is None and self.max_bytes is None:
+            return
+        now = time.time()
+        if now - self._last_gc < self.gc_interval:
+            return
+        self._last_gc = now
+        self.collect_garbage()
+
+    def collect_garbage(self):
+        """
+        Removes expired job folders and objects. Other processes may sweep the same root at the same
+        time, so anything that disappears mid-sweep counts as already removed.
+        """
+        now = time.time()
+        with self._lock:
+            # Abandoned job folders (e.g. from a crashed worker)
+            for job_id in os.listdir(self.jobs_folder):
+                job_path = os.path.join(self.jobs_folder, job_id)
+                try:
+                    expired = self.ttl_seconds is not None and now - os.path.getmtime(job_path) > self.ttl_seconds
+                except FileNotFoundError:
+                    continue
+                if expired:
+                    shutil.rmtree(job_path, ignore_errors=True)
+
+            objects = []
+            for dirpath, _, filenames in os.walk(self.objects_folder):
+                for filename in filenames:
+                    file_path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(file_path)
+                    except FileNotFoundError:
+                        continue
+                    if self.ttl_seconds is not None and now - stat.st_mtime > self.ttl_seconds:
+                        _remove(file_path)
+                    else:
+                        objects.append((stat.st_mtime, stat.st_size, file_path))
+
+            total_bytes = sum(size for _, size, _ in objects)
+            for _, size, file_path in sorted(objects):
+                if self.max_bytes is None or total_bytes <= self.max_bytes:
+                    break
+                _remove(file_path)
+                total_bytes -= size
+
+    def _object_path(self, artifact_id):
+        return os.path.join(self.objects_folder, artifact_id[:2], artifact_id)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _sha256_file(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _is_valid_artifact_id(artifact_id):
+    digest, _, extension = artifact_id.partition(".")
+    return len(digest) == 64 and all(c in "0123456789abcdef" for c in digest) and extension.isalnum()
@@ -0,0 +1,162 @@
+import csv
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from cache import cache_key
+
+RESULT_FILE = "result.json"  # Written last; its presence marks an item as completed
+SUMMARY_FILE = "summary.json"
+
+
+def load_manifest(path, defaults):
+    """
+    Reads a batch manifest, either CSV with a header row or JSON Lines, with the columns
+    title, word_count, voice_id and video. Missing values fall back to `defaults`.
+    Each item gets a stable id (an explicit `id` column, or derived from its parameters),
+    which names its output folder and lets an interrupted batch resume.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith((".jsonl", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    items = []
+    seen = {}
+    for row in rows:
+        row = {key.strip(): value for key, value in row.items() if value not in (None, "")}
+        item = {
+            "title": row.get("title"),
+            "word_count": int(row.get("word_count", defaults["word_count"])),
+            "voice_id": row.get("voice_id", defaults["voice_id"]),
+            "video": _as_bool(row.get("video", defaults["video"])),
+        }
+        item_id = row.get("id")
+        if item_id is None:
+            slug = re.sub(r"[^a-z0-9]+", "-", (item["title"] or "untitled").lower()).strip("-")[:40]
+            item_id = f"{slug}-{cache_key(item)[:8]}"
+        # The same parameters listed twice are two stories, not one
+        seen[item_id] = seen.get(item_id, 0) + 1
+        if seen[item_id] > 1:
+            item_id = f"{item_id}-{seen[item_id]}"
+        item["id"] = item_id
+        items.append(item)
+    return items
+
+
+def run_batch(items, output_folder, write, render, io_workers=4, cpu_workers=None):
+    """
+    Runs every manifest item through two stages and writes a summary report.
+
+    `write(item, folder)` does the network-bound work (story and narration) on a pool of
+    `io_workers` threads; as soon as an item is written, `render(item, folder)` runs the CPU-bound
+    mixing and encoding in a pool of `cpu_workers` processes (default: one per core).
+    The processes are spawned rather than forked, as forking while the writer threads hold locks
+    (stdout, metrics) can leave a child waiting on a lock nobody will release; `render` must be importable.
+    Both return a dict of details that end up in the item's result.json.
+    Items that already have a result.json are skipped, so rerunning a batch resumes it.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    start = time.time()
+    results = {}
+    pending = []
+    for item in items:
+        previous = _read_result(os.path.join(output_folder, item["id"]))
+        if previous is not None:
+            results[item["id"]] = dict(previous, skipped=True)
+        else:
+            pending.append(item)
+    print(f"Batch: {len(items)} items, {len(items) - len(pending)} already done, {len(pending)} to generate.")
+
+    with ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="batch-io") as io_pool, \
+            ProcessPoolExecutor(max_workers=cpu_workers or os.cpu_count(),
+                                mp_context=multiprocessing.get_context("spawn")) as cpu_pool:
+        writing = {}
+        for item in pending:
+            folder = os.path.join(output_folder, item["id"])
+            os.makedirs(folder, exist_ok=True)
+            writing[io_pool.submit(_timed, write, item, folder)] = (item, folder)
+
+        rendering = {}
+        for future in as_completed(writing):
+            item, folder = writing[future]
+            try:
+                written, write_seconds = future.result()
+            except Exception as e:
+                results[item["id"]] = _failed(item, "write", e)
+                continue
+            rendering[cpu_pool.submit(_timed, render, item, folder)] = (item, folder, written, write_seconds)
+
+        for future in as_completed(rendering):
+            item, folder, written, write_seconds = rendering[future]
+            try:
+                rendered, render_seconds = future.result()
+            except Exception as e:
+                results[item["id"]] = _failed(item, "render", e)
+                continue
+            result = dict(item, status="done", write_seconds=round(write_seconds, 3),
+                          render_seconds=round(render_seconds, 3), **written, **rendered)
+            _write_json(os.path.join(folder, RESULT_FILE), result)
+            results[item["id"]] = result
+            print(f"[{len(results)}/{len(items)}] {item['id']} done "
+                  f"(write {write_seconds:.1f}s, render {render_seconds:.1f}s)")
+
+    summary = summarize([results[item["id"]] for item in items if item["id"] in results], time.time() - start)
+    _write_json(os.path.join(output_folder, SUMMARY_FILE), summary)
+    return summary
+
+
+def summarize(results, wall_seconds):
+    generated = [r for r in results if r["status"] == "done" and not r.get("skipped")]
+    audio_seconds = sum(r.get("audio_seconds", 0) for r in generated)
+    totals = {
+        "items": len(results),
+        "generated": len(generated),
+        "skipped": sum(1 for r in results if r.get("skipped")),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "wall_seconds": round(wall_seconds, 3),
+        "write_seconds": round(sum(r["write_seconds"] for r in generated), 3),
+        "render_seconds": round(sum(r["render_seconds"] for r in generated), 3),
+        "audio_seconds": round(audio_seconds, 3),
+        # Throughput of this run only; skipped items cost nothing
+        "items_per_hour": round(len(generated) * 3600 / wall_seconds, 2) if wall_seconds else 0.0,
+        "audio_seconds_per_second": round(audio_seconds / wall_seconds, 2) if wall_seconds else 0.0,
+    }
+    return {"totals": totals, "items": results}
+
+
+def _timed(stage, item, folder):
+    start = time.perf_counter()
+    details = stage(item, folder)
+    return details or {}, time.perf_counter() - start
+
+
+def _failed(item, stage, error):
+    print(f"{item['id']} failed during {stage}: {error}")
+    return dict(item, status="failed", stage=stage, error=str(error))
+
+
+def _read_result(folder):
+    try:
+        with open(os.path.join(folder, RESULT_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
@@ -0,0 +1,53 @@
+"""
+Measures wall-clock narration time against chunk size and concurrency, using the local fake TTS server.
+
+    python -m benchmarks.bench_chunked_tts
+    python -m benchmarks.bench_chunked_tts --words 800 --chunk-chars 0 1000 500 --workers 1 4 8
+
+The fake server sleeps in proportion to the text it is given (--seconds-per-char), like the real API,
+so a single request for the whole story is the baseline that chunking has to beat.
+"""
+import argparse
+import time
+
+from chunked_tts import split_text, stitch, synthesize_chunks
+from fake_providers import fake_story, start_fake_server
+from providers import Provider, SpeechClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=700)
+    parser.add_argument("--chunk-chars", type=int, nargs="+", default=[0, 2000, 1000, 500, 250],
+                        help="Character budget per chunk; 0 sends the whole story at once")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds-per-char", type=float, default=0.0005)
+    parser.add_argument("--latency", type=float, default=0.15, help="Fixed per-request latency of the fake server")
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server(latency=args.latency, tts_seconds_per_char=args.seconds_per_char)
+    # The same client the app uses, with room for the largest worker count
+    client = SpeechClient("fake", base_url, Provider("elevenlabs", max_concurrency=max(args.workers)))
+    synthesize = lambda text: client.speech(text, "fake-voice")
+    story = fake_story(args.words)
+    print(f"Story: {args.words} words, {len(story)} characters\n")
+
+    print(f"{'chunk chars':>11} {'chunks':>6} {'workers':>7} {'synthesis (s)':>13} {'stitch (s)':>10} {'total (s)':>9}")
+    try:
+        for chunk_chars in args.chunk_chars:
+            chunks = split_text(story, chunk_chars) if chunk_chars else [story]
+            for workers in (args.workers if len(chunks) > 1 else [1]):
+                start = time.perf_counter()
+                audio_chunks = synthesize_chunks(chunks, synthesize, max_workers=workers)
+                synthesized = time.perf_counter()
+                stitch(audio_chunks)
+                done = time.perf_counter()
+                label = chunk_chars or "whole"
+                print(f"{label:>11} {len(chunks):>6} {workers:>7} {synthesized - start:>13.2f} "
+                      f"{done - synthesized:>10.2f} {done - start:>9.2f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
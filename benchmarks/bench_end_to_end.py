@@ -0,0 +1,253 @@
+"""
+Runs the whole story pipeline against the local fake providers and records how it performs.
+
+    python -m benchmarks.bench_end_to_end
+    python -m benchmarks.bench_end_to_end --clients 1 4 8 --requests 16 --seconds-per-word 0.4 --main-runs 3
+    python -m benchmarks.bench_end_to_end --compare bench_results/end_to_end-<old>.json bench_results/end_to_end-<new>.json
+
+Two scenarios, each run in a fresh interpreter inside its own scratch folder (artifacts, caches and a synthetic
+background track), so nothing is cached between runs:
+  app   N clients at once POST /generate to app.py, poll their job and download the audio, for each --clients
+  main  main.main() as one CLI run, repeated --main-runs times
+Per-stage latency, end-to-end latency, throughput, peak RSS (of the Python process; ffmpeg runs separately), output
+size and narration length go into a JSON file named after the current commit, ready for --compare.
+The fake server writes the story instantly and narrates it as a speech-like tone, --seconds-per-word long per word.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pydub import AudioSegment
+
+from fake_providers import start_fake_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ["story", "tts", "mix"]
+
+
+def summarize(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    ordered = sorted(values)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {"p50": round(pick(0.5), 3), "p95": round(pick(0.95), 3), "mean": round(statistics.mean(values), 3)}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def start_providers(args):
+    server, base_url = start_fake_server(latency=args.latency, seconds_per_word=args.seconds_per_word)
+    os.environ.update(OPENAI_BASE_URL=base_url, ELEVENLABS_API_URL=base_url)
+    return server
+
+
+def run_app(args):
+    start_providers(args)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+
+    def one_request(index):
+        client = app.app.test_client()
+        start = time.perf_counter()
+        # fresh skips the caches, so every request pays for the whole pipeline
+        response = client.post("/generate", json={"story_name": f"Benchmark story {index}", "fresh": True})
+        job = response.get_json()
+        if response.status_code >= 400:
+            return {"error": job.get("error", response.status_code)}
+        while job["status"] not in ("done", "failed"):
+            time.sleep(0.05)
+            job = client.get(f"/jobs/{job['job_id']}?trace=1").get_json()
+        if job["status"] == "failed":
+            return {"error": job.get("error")}
+        audio = client.get(job["audio_url"]).data
+        return {"seconds": time.perf_counter() - start, "stages": job["timings"], "queue_wait": job.get("queue_wait"),
+                "output_bytes": len(audio),
+                "narration_seconds": job.get("trace", {}).get("counters", {}).get("narration_audio_seconds")}
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.clients) as executor:
+        results = list(executor.map(one_request, range(args.requests)))
+    wall = time.perf_counter() - start
+    return report(results, wall, clients=args.clients)
+
+
+def run_main(args):
+    start_providers(args)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+        start = time.perf_counter()
+        result = main.main()
+    seconds = time.perf_counter() - start
+    if result["audio"] is None:
+        return report([{"error": "main.main() produced no audio"}], seconds)
+    stages = {span["name"]: span["seconds"] for span in result["trace"]["spans"]}
+    return report([{"seconds": seconds, "stages": stages, "output_bytes": os.path.getsize(result["audio"]),
+                    "narration_seconds": result["trace"]["counters"].get("narration_audio_seconds")}], seconds)
+
+
+def report(results, wall, clients=1):
+    done = [result for result in results if "error" not in result]
+    return {
+        "clients": clients,
+        "requests": len(results),
+        "errors": [result["error"] for result in results if "error" in result],
+        "wall_seconds": round(wall, 3),
+        "throughput_per_minute": round(60 * len(done) / wall, 2) if wall else None,
+        "latency_seconds": summarize([result["seconds"] for result in done]),
+        "queue_wait_seconds": summarize([result.get("queue_wait") for result in done]),
+        "stage_seconds": {stage: summarize([result["stages"].get(stage) for result in done]) for stage in STAGES},
+        "output_bytes": summarize([result["output_bytes"] for result in done]),
+        "narration_seconds": summarize([result["narration_seconds"] for result in done]),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def merge_runs(runs):
+    """
+    Combines separate one-request main runs into a single report.
+    """
+    def values(get):
+        return [get(run) for run in runs if get(run) is not None]
+
+    wall = sum(run["wall_seconds"] for run in runs)
+    return {
+        "clients": 1,
+        "requests": len(runs),
+        "errors": [error for run in runs for error in run["errors"]],
+        "wall_seconds": round(wall, 3),
+        "throughput_per_minute": round(60 * sum(not run["errors"] for run in runs) / wall, 2) if wall else None,
+        "latency_seconds": summarize(values(lambda run: (run["latency_seconds"] or {}).get("mean"))),
+        "queue_wait_seconds": None,
+        "stage_seconds": {stage: summarize(values(lambda run: (run["stage_seconds"][stage] or {}).get("mean")))
+                          for stage in STAGES},
+        "output_bytes": summarize(values(lambda run: (run["output_bytes"] or {}).get("mean"))),
+        "narration_seconds": summarize(values(lambda run: (run["narration_seconds"] or {}).get("mean"))),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+    }
+
+
+def run_child(scenario, args, music_path):
+    """
+    Runs one scenario in a new interpreter inside a scratch folder and returns its report.
+    """
+    folder = tempfile.mkdtemp(prefix="bench-e2e-")
+    try:
+        os.makedirs(os.path.join(folder, "background_music"))
+        shutil.copy(music_path, os.path.join(folder, "background_music"))
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT, OPENAI_API_KEY="fake", XI_API_KEY="fake",
+                   JOB_QUEUE_DEPTH=str(max(16, args.requests)))
+        command = [sys.executable, "-m", "benchmarks.bench_end_to_end", "--child", scenario,
+                   "--clients", str(args.clients[0]), "--requests", str(args.requests),
+                   "--seconds-per-word", str(args.seconds_per_word), "--latency", str(args.latency)]
+        result = subprocess.run(command, cwd=folder, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{scenario} run failed:\n{result.stderr.strip()}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def current_commit():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or "unknown"
+
+
+def print_report(name, data):
+    latency = data["latency_seconds"] or {}
+    stages = "  ".join(f"{stage} {values['p50']:.2f}s" for stage, values in data["stage_seconds"].items() if values)
+    print(f"{name:<8} {data['requests'] - len(data['errors']):>3}/{data['requests']:<3} "
+          f"{data['throughput_per_minute'] or 0:>7.1f}/min  p50 {latency.get('p50', 0):6.2f}s  p95 {latency.get('p95', 0):6.2f}s  "
+          f"{stages}  rss {data['peak_rss_mb']:.0f} MB  "
+          f"out {(data['output_bytes'] or {}).get('p50', 0) / 1024:.0f} KB")
+    for error in data["errors"][:3]:
+        print(f"         error: {error}")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'scenario':<8} {'metric':<24} {old['commit']:>12} {new['commit']:>12} {'change':>8}")
+    for name in sorted(set(old["scenarios"]) & set(new["scenarios"])):
+        before, after = old["scenarios"][name], new["scenarios"][name]
+        metrics = [("latency p50 (s)", lambda d: (d["latency_seconds"] or {}).get("p50")),
+                   ("latency p95 (s)", lambda d: (d["latency_seconds"] or {}).get("p95")),
+                   ("throughput (/min)", lambda d: d["throughput_per_minute"]),
+                   ("peak RSS (MB)", lambda d: d["peak_rss_mb"]),
+                   ("output (bytes)", lambda d: (d["output_bytes"] or {}).get("p50"))]
+        metrics += [(f"{stage} p50 (s)", lambda d, stage=stage: (d["stage_seconds"].get(stage) or {}).get("p50"))
+                    for stage in STAGES]
+        for label, value in metrics:
+            a, b = value(before), value(after)
+            change = f"{100 * (b - a) / a:+.1f}%" if a and b is not None else ""
+            print(f"{name:<8} {label:<24} {a if a is not None else '-':>12} {b if b is not None else '-':>12} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4], help="Concurrent app clients to try")
+    parser.add_argument("--requests", type=int, default=8, help="Requests per app run")
+    parser.add_argument("--main-runs", type=int, default=2)
+    parser.add_argument("--seconds-per-word", type=float, default=0.2,
+                        help="Length of the synthetic narration (0.4 is about the pace of real speech)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Fixed per-request latency of the fake providers")
+    parser.add_argument("--scenarios", nargs="+", default=["app", "main"], choices=["app", "main"])
+    parser.add_argument("--json", metavar="PATH", help="Default: bench_results/end_to_end-<commit>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    parser.add_argument("--child", choices=["app", "main"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.child:
+        args.clients = args.clients[0]
+        print(json.dumps(run_app(args) if args.child == "app" else run_main(args)))
+        return
+
+    commit = current_commit()
+    results = {"commit": commit, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "config": {"requests": args.requests, "seconds_per_word": args.seconds_per_word,
+                          "latency": args.latency, "python": sys.version.split()[0]},
+               "scenarios": {}}
+    with tempfile.TemporaryDirectory() as folder:
+        music_path = os.path.join(folder, "synthetic.mp3")
+        subprocess.run([AudioSegment.converter, "-y", "-loglevel", "error", "-f", "lavfi",
+                        "-i", "anoisesrc=d=120:c=pink:a=0.1:seed=3", "-ac", "2", "-ar", "44100", music_path],
+                       check=True)
+        if "app" in args.scenarios:
+            for clients in args.clients:
+                name = f"app-{clients}"
+                child_args = argparse.Namespace(**{**vars(args), "clients": [clients]})
+                results["scenarios"][name] = run_child("app", child_args, music_path)
+                print_report(name, results["scenarios"][name])
+        if "main" in args.scenarios:
+            runs = [run_child("main", args, music_path) for _ in range(args.main_runs)]
+            merged = merge_runs(runs)
+            results["scenarios"]["main"] = merged
+            print_report("main", merged)
+
+    path = args.json or os.path.join("bench_results", f"end_to_end-{commit}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
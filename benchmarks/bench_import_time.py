@@ -0,0 +1,108 @@
+"""
+Measures how long `import app` and `import main` take in a fresh interpreter and checks them against a budget.
+
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --runs 10 --budget app=300 main=150 --top 15
+
+Each module is imported under `python -X importtime` without API keys in the environment,
+which also checks that importing needs no credentials. The run fails (exit code 1) when the median
+import time is over budget or when one of the deferred heavy packages was imported anyway.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Only needed once a story is generated, mixed or rendered
+DEFERRED = ["openai", "httpx", "numpy", "pydub", "PIL", "moviepy", "imageio_ffmpeg"]
+DEFAULT_BUDGET_MS = {"app": 400, "main": 200}
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_once(module):
+    """
+    Imports `module` in a new interpreter and returns (total seconds, {package: cumulative seconds}, deferred loaded).
+    """
+    env = {key: value for key, value in os.environ.items() if key not in ("OPENAI_API_KEY", "XI_API_KEY")}
+    code = (f"import sys, json; import {module}; "
+            f"print(json.dumps([name for name in {DEFERRED!r} if name in sys.modules]))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {result.stderr.strip().splitlines()[-1]}")
+
+    # Children are listed before their parent; keep the direct children of `module` only
+    total = None
+    children = {}
+    pending = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)) / 1e6, len(match.group(3)) // 2, match.group(4)
+        if depth == 1:
+            pending[name] = pending.get(name, 0) + cumulative
+        elif depth == 0:
+            if name == module:
+                total, children = cumulative, pending
+            pending = {}
+    return total, children, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def parse_budget(values):
+    budget = dict(DEFAULT_BUDGET_MS)
+    for value in values or []:
+        module, _, milliseconds = value.partition("=")
+        budget[module] = float(milliseconds)
+    return budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["app", "main"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", nargs="+", metavar="MODULE=MS", help="Override the per-module budget")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest direct imports to list")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    budget = parse_budget(args.budget)
+    results = {}
+    ok = True
+    for module in args.modules:
+        try:
+            runs = [import_once(module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(e)
+            results[module] = {"error": str(e)}
+            ok = False
+            continue
+        median = statistics.median(total for total, _, _ in runs)
+        children = {name: statistics.median(run[1].get(name, 0) for run in runs) for name in runs[0][1]}
+        deferred_loaded = sorted(set().union(*(set(loaded) for _, _, loaded in runs)))
+        limit = budget.get(module)
+        over_budget = limit is not None and median * 1000 > limit
+        ok = ok and not over_budget and not deferred_loaded
+
+        print(f"import {module}: median {median * 1000:.0f} ms over {args.runs} runs"
+              + (f" (budget {limit:.0f} ms{', OVER BUDGET' if over_budget else ''})" if limit is not None else ""))
+        for name, seconds in sorted(children.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {seconds * 1000:7.1f} ms  {name}")
+        if deferred_loaded:
+            print(f"    imported eagerly but should be deferred: {', '.join(deferred_loaded)}")
+        results[module] = {"median_ms": round(median * 1000, 1), "budget_ms": limit,
+                           "runs_ms": [round(total * 1000, 1) for total, _, _ in runs],
+                           "deferred_loaded": deferred_loaded}
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Measures what loudness analysis and ducking cost on long narrations.
+
+    python -m benchmarks.bench_loudness
+    python -m benchmarks.bench_loudness --minutes 1 15 60 --repeat 3 --duck-db 6
+
+For each narration length it times:
+  global dBFS    the level measurement mixing used before (pydub's dBFS, one audioop pass)
+  envelope       the windowed RMS envelope, which gives the same overall level as a by-product
+  ducking curve  turning the narration and (cached) music envelopes into the bed's gain curve
+  mix            mix_tracks without and with ducking
+The narration alternates between speech and pauses so the curve has something to follow.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_mixing import best_of, synthetic_audio
+from loudness import Envelope, ducking_curve
+from mixing import mix_tracks
+from music_library import MusicTrack
+
+
+def synthetic_narration(seconds, frame_rate, seed):
+    narration = synthetic_audio(seconds, frame_rate, 1, 9000, seed)
+    samples = np.frombuffer(narration.raw_data, dtype=np.int16).copy()
+    # Sentences of about 4 s separated by pauses of 0.8 s
+    positions = np.arange(len(samples)) / frame_rate
+    samples[np.mod(positions, 4.8) >= 4.0] //= 200
+    return narration._spawn(samples.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 15, 60])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--duck-db", type=float, default=6)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    track = MusicTrack("synthetic", synthetic_audio(150, 44100, 2, 4000, seed=1))
+    print(f"music track loaded and analysed once in {time.perf_counter() - start:.3f} s (envelope cached on the track)")
+
+    print(f"{'narration':>10} {'global dBFS':>12} {'envelope':>9} {'ducking curve':>14} "
+          f"{'mix':>7} {'mix+ducking':>12} {'same level':>11}")
+    for minutes in args.minutes:
+        tts_audio = synthetic_narration(minutes * 60, 44100, seed=2)
+        samples = np.frombuffer(tts_audio.raw_data, dtype=np.int16)
+        level_time, level = best_of(args.repeat, lambda: tts_audio.dBFS)
+        envelope_time, envelope = best_of(args.repeat, Envelope.of, samples, 44100, 1, 2)
+        total_frames = int(tts_audio.frame_count()) + 5 * 44100
+        curve_time, _ = best_of(args.repeat, ducking_curve, envelope, track.envelope, 44100, total_frames,
+                                -12.0, args.duck_db)
+        mix_time, _ = best_of(args.repeat, mix_tracks, tts_audio, track)
+        ducked_time, _ = best_of(args.repeat, lambda: mix_tracks(tts_audio, track, duck_db=args.duck_db))
+        print(f"{minutes:>8g} m {level_time:>11.3f}s {envelope_time:>8.3f}s {curve_time:>13.3f}s "
+              f"{mix_time:>6.2f}s {ducked_time:>11.2f}s {str(envelope.dBFS() == level):>11}")
+
+
+if __name__ == "__main__":
+    main()
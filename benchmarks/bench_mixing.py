@@ -0,0 +1,67 @@
+"""
+Compares the NumPy mixing engine with the original pydub overlay/gain/fade chain.
+
+    python -m benchmarks.bench_mixing
+    python -m benchmarks.bench_mixing --minutes 1 5 15 --repeat 3
+
+Encoding to MP3 is the same for both and is left out of the timings.
+"""
+import argparse
+import time
+
+import numpy as np
+from pydub import AudioSegment
+
+from mixing import mix_tracks
+from music_library import MusicTrack
+
+
+def synthetic_audio(seconds, frame_rate, channels, amplitude, seed):
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * frame_rate)
+    t = np.arange(frames) / frame_rate
+    # Noise under a slow envelope, so the level varies like speech or music does
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 0.5 * t)
+    samples = rng.standard_normal((frames, channels)) * amplitude * envelope[:, None]
+    samples = np.clip(samples, -32768, 32767).astype(np.int16)
+    return AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=frame_rate, channels=channels)
+
+
+def pydub_mix(tts_audio, background_music):
+    # The chain mix_audio used before the NumPy engine
+    total_duration = len(tts_audio) + 5000
+    background_music = (background_music * ((total_duration // len(background_music)) + 1))[:total_duration]
+    background_music += (tts_audio.dBFS - background_music.dBFS - 12)
+    mixed_audio = background_music.overlay(tts_audio)
+    return mixed_audio.fade_out(6000)
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5, 15])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # ElevenLabs narration is 44.1 kHz mono; background tracks are usually 44.1 kHz stereo
+    track = MusicTrack("synthetic", synthetic_audio(150, 44100, 2, 4000, seed=1))
+
+    print(f"{'narration':>10} {'pydub (s)':>10} {'numpy (s)':>10} {'speedup':>8} {'identical':>10}")
+    for minutes in args.minutes:
+        tts_audio = synthetic_audio(minutes * 60, 44100, 1, 9000, seed=2)
+        pydub_time, expected = best_of(args.repeat, pydub_mix, tts_audio, track.audio)
+        numpy_time, mixed = best_of(args.repeat, mix_tracks, tts_audio, track)
+        identical = expected.raw_data == mixed.raw_data
+        print(f"{minutes:>8g} m {pydub_time:>10.3f} {numpy_time:>10.3f} {pydub_time / numpy_time:>7.1f}x {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
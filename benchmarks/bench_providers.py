@@ -0,0 +1,123 @@
+"""
+Exercises the provider client layer against the local fake server.
+
+    python -m benchmarks.bench_providers
+    python -m benchmarks.bench_providers --calls 400 --tail-rate 0.05 --tail-latency 2
+
+Four scenarios:
+  connections  one new connection per call (requests.post, as before) vs the keep-alive pool
+  retries      share of calls that succeed when the server fails --error-rate of requests
+  hedging      latency percentiles with slow tail requests, without and with hedging
+  async        the same calls through aspeech() with asyncio.gather
+Against localhost a new connection is cheap; over TLS to the real APIs the gap is much larger.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from fake_providers import start_fake_server
+from providers import Provider, SpeechClient
+
+TEXT = "The floorboards creaked somewhere above me."
+
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return f"p50 {1000 * pick(0.5):7.1f} ms  p95 {1000 * pick(0.95):7.1f} ms  p99 {1000 * pick(0.99):7.1f} ms"
+
+
+def timed_calls(call, calls, workers):
+    def one(_):
+        start = time.perf_counter()
+        try:
+            call()
+            return time.perf_counter() - start, True
+        except Exception:
+            return time.perf_counter() - start, False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(one, range(calls)))
+    return [latency for latency, _ in results], sum(ok for _, ok in results)
+
+
+def bench_connections(base_url, calls):
+    url = f"{base_url}/text-to-speech/voice/stream"
+    start = time.perf_counter()
+    for _ in range(calls):
+        requests.post(url, json={"text": TEXT}).raise_for_status()
+    fresh = time.perf_counter() - start
+
+    client = SpeechClient("fake", base_url, Provider("elevenlabs", max_concurrency=1))
+    start = time.perf_counter()
+    for _ in range(calls):
+        client.speech(TEXT, "voice")
+    pooled = time.perf_counter() - start
+    print(f"connections  new connection per call {1000 * fresh / calls:6.2f} ms/call, "
+          f"keep-alive pool {1000 * pooled / calls:6.2f} ms/call")
+
+
+def bench_retries(base_url, calls, workers):
+    url = f"{base_url}/text-to-speech/voice/stream"
+    _, naive_ok = timed_calls(lambda: requests.post(url, json={"text": TEXT}).raise_for_status(), calls, workers)
+    client = SpeechClient("fake", base_url, Provider("elevenlabs", max_concurrency=workers, backoff=0.05))
+    _, client_ok = timed_calls(lambda: client.speech(TEXT, "voice"), calls, workers)
+    print(f"retries      without retry {naive_ok}/{calls} succeeded, with retry {client_ok}/{calls} succeeded")
+
+
+def bench_hedging(base_url, calls, workers, hedge_after):
+    for label, hedge in (("no hedging", None), (f"hedge after {hedge_after}s", hedge_after)):
+        # Losing copies of hedged calls still run to completion, so leave room for them
+        client = SpeechClient("fake", base_url, Provider("elevenlabs", max_concurrency=4 * workers, hedge_after=hedge))
+        latencies, _ = timed_calls(lambda: client.speech(TEXT, "voice"), calls, workers)
+        print(f"hedging      {label:<18} {percentiles(latencies)}")
+
+
+def bench_async(base_url, calls, workers):
+    client = SpeechClient("fake", base_url, Provider("elevenlabs", max_concurrency=workers))
+
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(*(client.aspeech(TEXT, "voice") for _ in range(calls)))
+        return time.perf_counter() - start
+
+    seconds = asyncio.run(run())
+    print(f"async        {calls} calls, {workers} in flight: {seconds:.2f} s ({calls / seconds:.0f} calls/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-latency", type=float, default=1.0)
+    parser.add_argument("--hedge-after", type=float, default=0.2)
+    args = parser.parse_args()
+
+    servers = []
+    try:
+        server, base_url = start_fake_server(seconds_per_word=0.05)
+        servers.append(server)
+        bench_connections(base_url, args.calls)
+
+        server, base_url = start_fake_server(latency=args.latency, seconds_per_word=0.05, error_rate=args.error_rate)
+        servers.append(server)
+        bench_retries(base_url, args.calls, args.workers)
+
+        server, base_url = start_fake_server(latency=args.latency, seconds_per_word=0.05,
+                                             tail_rate=args.tail_rate, tail_latency=args.tail_latency)
+        servers.append(server)
+        bench_hedging(base_url, args.calls, args.workers, args.hedge_after)
+        bench_async(base_url, args.calls, args.workers)
+    finally:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compares peak memory and time of the in-memory mix (mix_tracks) with the block-by-block mix (mix_files).
+
+    python -m benchmarks.bench_streaming_mix
+    python -m benchmarks.bench_streaming_mix --minutes 5 30 60 --tolerance 2
+
+Narrations are synthetic MP3 files written by ffmpeg. Each mix runs in its own interpreter and reports how far
+its peak RSS rose above the baseline taken after the music track was loaded; the ffmpeg processes are not counted.
+The two MP3 files are then decoded block by block and compared sample by sample.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from pydub import AudioSegment
+
+from mixing import _pcm_blocks, mix_files, mix_tracks
+from music_library import MusicTrack
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_synthetic(path, seconds, channels, amplitude):
+    # Pink noise has a speech- or music-like spectrum and never repeats
+    subprocess.run([AudioSegment.converter, "-y", "-loglevel", "error", "-f", "lavfi",
+                    "-i", f"anoisesrc=d={seconds}:c=pink:a={amplitude}:seed=7",
+                    "-ac", str(channels), "-ar", "44100", path], check=True)
+
+
+def run_child(mode, tts_path, music_path, output_path):
+    track = MusicTrack(music_path, AudioSegment.from_file(music_path))
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "memory":
+        # What mix_audio does for short narrations
+        mix_tracks(AudioSegment.from_file(tts_path), track).export(output_path, format="mp3")
+    else:
+        mix_files(tts_path, track, output_path)
+    print(json.dumps({"seconds": time.perf_counter() - start, "peak_mb": peak_rss_mb() - baseline}))
+
+
+def measure(mode, tts_path, music_path, output_path):
+    result = subprocess.run([sys.executable, "-m", "benchmarks.bench_streaming_mix", "--child", mode,
+                             tts_path, music_path, output_path], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(path_a, path_b):
+    """
+    Returns (frames that differ in length, largest absolute sample difference) without decoding either file whole.
+    """
+    blocks_a, blocks_b = _pcm_blocks(path_a, 2, 44100, 2), _pcm_blocks(path_b, 2, 44100, 2)
+    length_difference, largest = 0, 0
+    for block_a in blocks_a:
+        block_b = next(blocks_b, np.empty(0, dtype=np.int16))
+        count = min(len(block_a), len(block_b))
+        length_difference += (len(block_a) - len(block_b)) // 2
+        if count:
+            difference = np.abs(block_a[:count].astype(np.int32) - block_b[:count])
+            largest = max(largest, int(difference.max()))
+    length_difference -= sum(len(block) for block in blocks_b) // 2
+    return length_difference, largest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[5, 15, 30])
+    parser.add_argument("--tolerance", type=int, default=2, help="Largest sample difference accepted")
+    parser.add_argument("--child", nargs=4, metavar=("MODE", "TTS", "MUSIC", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(*args.child)
+        return
+
+    ok = True
+    with tempfile.TemporaryDirectory() as folder:
+        music_path = os.path.join(folder, "music.wav")
+        write_synthetic(music_path, 150, 2, 0.1)
+        print(f"{'narration':>10} {'memory MB':>10} {'stream MB':>10} {'memory s':>9} {'stream s':>9} "
+              f"{'max diff':>9} {'length diff':>12}")
+        for minutes in args.minutes:
+            tts_path = os.path.join(folder, "narration.mp3")
+            write_synthetic(tts_path, minutes * 60, 1, 0.3)
+            outputs = {mode: os.path.join(folder, f"{mode}.mp3") for mode in ("memory", "streaming")}
+            results = {mode: measure(mode, tts_path, music_path, path) for mode, path in outputs.items()}
+            length_difference, largest = compare(outputs["memory"], outputs["streaming"])
+            ok = ok and largest <= args.tolerance and length_difference == 0
+            print(f"{minutes:>8g} m {results['memory']['peak_mb']:>10.0f} {results['streaming']['peak_mb']:>10.0f} "
+                  f"{results['memory']['seconds']:>9.2f} {results['streaming']['seconds']:>9.2f} "
+                  f"{largest:>9} {length_difference:>12}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
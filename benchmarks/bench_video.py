@@ -0,0 +1,107 @@
+"""
+Compares slideshow assembly in the old moviepy implementation with the planned, single-pass video engine.
+
+    python -m benchmarks.bench_video
+    python -m benchmarks.bench_video --minutes 10 30 60 --sample-frames 48
+    python -m benchmarks.bench_video --minutes 10 --encode    # also time a full render of the new engine
+
+For each narration length it times building the video and rendering --sample-frames frames spread over it.
+The old engine re-decodes every image and nests one composite clip per extra image, so the cost of a frame
+grows with the length of the video; the new engine's does not.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from PIL import Image
+from pydub import AudioSegment
+
+from video import FrameCache, Slideshow, list_images, plan_timeline, render_slideshow
+
+if not hasattr(Image, "ANTIALIAS"):
+    # moviepy 1.0.3 resizes with a constant that Pillow 10 removed
+    Image.ANTIALIAS = Image.LANCZOS
+
+
+def moviepy_slideshow(audio_duration, image_files, display_duration_range, transition_duration, video_size):
+    # The assembly create_video_with_images used before the video engine (without audio and encoding)
+    from moviepy.editor import ImageClip, concatenate_videoclips
+
+    def image_clip(img_path):
+        img_clip = ImageClip(img_path).set_duration(random.uniform(*display_duration_range))
+        img_clip = img_clip.resize(height=video_size[1])
+        if img_clip.w > video_size[0]:
+            img_clip = img_clip.resize(width=video_size[0])
+        img_clip = img_clip.on_color(size=video_size, color=(0, 0, 0), pos='center')
+        return img_clip.fadein(transition_duration).fadeout(transition_duration)
+
+    avg_display_duration = sum(display_duration_range) / 2
+    num_images = max(1, int(audio_duration / avg_display_duration))
+    clips = [image_clip(img_path) for img_path in random.choices(image_files, k=num_images)]
+    video = concatenate_videoclips(clips, method="compose", padding=-transition_duration)
+
+    if video.duration < audio_duration:
+        additional_duration = audio_duration - video.duration
+        for img_path in random.choices(image_files, k=int(additional_duration / avg_display_duration) + 1):
+            video = concatenate_videoclips([video, image_clip(img_path)], method="compose", padding=-transition_duration)
+            if video.duration >= audio_duration:
+                break
+    return video.subclip(0, audio_duration)
+
+
+def sample_times(duration, count):
+    return [duration * (i + 0.5) / count for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 30, 60])
+    parser.add_argument("--images-folder", default="images/")
+    parser.add_argument("--sample-frames", type=int, default=48)
+    parser.add_argument("--encode", action="store_true", help="Also time a full render with the new engine")
+    parser.add_argument("--fps", type=int, default=24)
+    parser.add_argument("--skip-old", action="store_true")
+    args = parser.parse_args()
+
+    image_files = list_images(args.images_folder)
+    display_duration_range, transition_duration, video_size = (30, 45), 2, (1280, 720)
+
+    print(f"{'narration':>10} {'engine':>8} {'build (s)':>10} {'frames (s)':>10} {'ms/frame':>9} {'encode (s)':>10}")
+    for minutes in args.minutes:
+        duration = minutes * 60
+        times = sample_times(duration, args.sample_frames)
+
+        if not args.skip_old:
+            start = time.perf_counter()
+            video = moviepy_slideshow(duration, image_files, display_duration_range, transition_duration, video_size)
+            built = time.perf_counter()
+            for t in times:
+                video.get_frame(t)
+            done = time.perf_counter()
+            print(f"{minutes:>8g} m {'moviepy':>8} {built - start:>10.2f} {done - built:>10.2f} "
+                  f"{1000 * (done - built) / len(times):>9.1f} {'-':>10}")
+
+        start = time.perf_counter()
+        slides = plan_timeline(duration, image_files, display_duration_range, transition_duration)
+        slideshow = Slideshow(slides, video_size, transition_duration, FrameCache())
+        built = time.perf_counter()
+        for t in times:
+            slideshow.frame_at(t)
+        done = time.perf_counter()
+
+        encode = "-"
+        if args.encode:
+            with tempfile.TemporaryDirectory() as folder:
+                audio_path = os.path.join(folder, "narration.wav")
+                AudioSegment.silent(duration=int(duration * 1000), frame_rate=8000).export(audio_path, format="wav")
+                encode_start = time.perf_counter()
+                render_slideshow(audio_path, duration, slideshow, os.path.join(folder, "video.mp4"), fps=args.fps)
+                encode = f"{time.perf_counter() - encode_start:.2f}"
+        print(f"{minutes:>8g} m {'engine':>8} {built - start:>10.2f} {done - built:>10.2f} "
+              f"{1000 * (done - built) / len(times):>9.1f} {encode:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+TMP_SUFFIX = ".tmp"  # Entries being written; renamed into place when complete
+
+
+def cache_key(*parts):
+    """
+    Stable key for any JSON-serializable request parameters.
+    """
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-level cache for expensive API results stored as bytes.
+
+    Recently used values stay in an in-memory LRU bounded by `memory_bytes`; everything is also
+    written to `folder` so results survive restarts and are shared between processes.
+    Entries on disk expire after `ttl_seconds` and the oldest are evicted past `max_bytes`.
+    """
+    def __init__(self, folder, memory_bytes=64 * 1024 ** 2, max_bytes=1024 ** 3,
+                 ttl_seconds=7 * 24 * 3600, gc_interval=300):
+        self.folder = folder
+        self.memory_bytes = memory_bytes
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.gc_interval = gc_interval
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._last_gc = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        os.makedirs(folder, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if time.time() < expires_at:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                self._forget(key)
+
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)  # Keep recently used entries away from eviction
+        except FileNotFoundError:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self._stats["disk_hits"] += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        """
+        Stores `value` in memory and on disk. A failed disk write is only logged: the result was
+        already paid for, and the caller has it either way.
+        """
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=TMP_SUFFIX)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(value)
+                os.replace(tmp_path, path)
+            except BaseException:
+                _remove(tmp_path)
+                raise
+        except OSError as e:
+            print(f"Warning: could not write cache entry {key[:12]}: {e}")
+
+        with self._lock:
+            self._stats["writes"] += 1
+            self._remember(key, value)
+        try:
+            self._maybe_collect_garbage()
+        except Exception as e:
+            print(f"Warning: cache garbage collection failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_size
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+    def collect_garbage(self):
+        """
+        Removes expired entries, then the oldest ones past `max_bytes`. Other processes may sweep or
+        write the same folder at the same time, so entries that vanish mid-sweep count as removed.
+        """
+        now = time.time()
+        entries = []
+        for dirpath, _, filenames in os.walk(self.folder):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime > self.ttl_seconds:
+                    _remove(path)
+                elif not filename.endswith(TMP_SUFFIX):
+                    # Files still being written are never evicted for size; only once stale (a crashed writer)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            _remove(path)
+            total_bytes -= size
+
+    def _remember(self, key, value):
+        # Values bigger than the whole memory budget are only kept on disk
+        if len(value) > self.memory_bytes:
+            return
+        self._forget(key)
+        self._memory[key] = (value, time.time() + self.ttl_seconds)
+        self._memory_size += len(value)
+        while self._memory_size > self.memory_bytes:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _forget(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_size -= len(entry[0])
+
+    def _maybe_collect_garbage(self):
+        now = time.time()
+        if now - self._last_gc < self.gc_interval:
+            return
+        self._last_gc = now
+        self.collect_garbage()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], key)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,98 @@
+import contextvars
+import io
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pydub import AudioSegment
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?…])\s+|(?<=[.!?…][\"'”’)\]])\s+")
+
+
+def split_text(text, max_chars=1000):
+    """
+    Splits a story into chunks of at most `max_chars`, cutting at paragraph breaks where possible,
+    then at sentence ends, and only splitting inside a sentence (between words) when it is too long on its own.
+    """
+    chunks = []
+    current = ""
+    for paragraph in PARAGRAPH_BREAK.split(text.strip()):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        for piece in _pieces(paragraph, max_chars):
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+        # Prefer to end a chunk on a paragraph break once it is reasonably full
+        if len(current) >= max_chars // 2:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def synthesize_chunks(chunks, synthesize, max_workers=4, retries=3, backoff=0.5):
+    """
+    Runs `synthesize(chunk)` for every chunk on a bounded thread pool and returns the results in order.
+    Each chunk is retried on its own, with jittered exponential backoff, before the whole run fails.
+    Chunks run in a copy of the caller's context, so context variables such as the active trace carry over.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-chunk") as executor:
+        futures = [executor.submit(contextvars.copy_context().run, _with_retries, synthesize, chunk, retries, backoff)
+                   for chunk in chunks]
+        return [future.result() for future in futures]
+
+
+def stitch(audio_chunks, silence_ms=250):
+    """
+    Decodes the synthesized chunks and joins them in order with `silence_ms` of silence in between.
+    """
+    segments = [AudioSegment.from_file(io.BytesIO(data)) for data in audio_chunks]
+    stitched = segments[0]
+    for segment in segments[1:]:
+        if silence_ms:
+            stitched += AudioSegment.silent(duration=silence_ms, frame_rate=stitched.frame_rate)
+        stitched += segment
+    return stitched
+
+
+def chunked_speech(text, synthesize, max_chars=1000, max_workers=4, silence_ms=250, retries=3):
+    chunks = split_text(text, max_chars)
+    print(f"Synthesizing {len(chunks)} chunks with {min(max_workers, len(chunks))} workers...")
+    return stitch(synthesize_chunks(chunks, synthesize, max_workers, retries), silence_ms)
+
+
+def _pieces(paragraph, max_chars):
+    for sentence in SENTENCE_BREAK.split(paragraph):
+        if len(sentence) <= max_chars:
+            yield sentence
+            continue
+        # A single sentence over the budget is cut between words
+        words = sentence.split(" ")
+        piece = ""
+        for word in words:
+            if piece and len(piece) + 1 + len(word) > max_chars:
+                yield piece
+                piece = word
+            else:
+                piece = f"{piece} {word}" if piece else word
+        if piece:
+            yield piece
+
+
+def _with_retries(synthesize, chunk, retries, backoff):
+    for attempt in range(retries + 1):
+        try:
+            return synthesize(chunk)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"TTS chunk failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
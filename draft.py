@@ -1,20 +1,22 @@
 from pydub import AudioSegment
 
-# Load an audio file
-audio = AudioSegment.from_file("background_music/Kevin MacLeod  Giant Wyrm.mp3")
 
-# Increase volume by 10 dB
-louder_audio = audio + 5
+if __name__ == "__main__":
+    # Load an audio file
+    audio = AudioSegment.from_file("background_music/Kevin MacLeod  Giant Wyrm.mp3")
 
-# Decrease volume by 5 dB
-quieter_audio = audio - 5
+    # Increase volume by 10 dB
+    louder_audio = audio + 5
 
-# # Export the adjusted volume audio files
-# louder_audio.export("louder_audio.mp3", format="mp3")
-# quieter_audio.export("quieter_audio.mp3", format="mp3")
+    # Decrease volume by 5 dB
+    quieter_audio = audio - 5
 
-# print("Volume adjusted and files saved.")
+    # # Export the adjusted volume audio files
+    # louder_audio.export("louder_audio.mp3", format="mp3")
+    # quieter_audio.export("quieter_audio.mp3", format="mp3")
 
-print(audio.dBFS)
-print(louder_audio.dBFS)
-print(quieter_audio.dBFS)
\ No newline at end of file
+    # print("Volume adjusted and files saved.")
+
+    print(audio.dBFS)
+    print(louder_audio.dBFS)
+    print(quieter_audio.dBFS)
@@ -0,0 +1,206 @@
+"""
+Local stand-ins for the OpenAI and ElevenLabs HTTP APIs so the pipeline can run offline.
+
+    python fake_providers.py --port 8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 ELEVENLABS_API_URL=http://127.0.0.1:8765/v1 \\
+        OPENAI_API_KEY=fake XI_API_KEY=fake python app.py
+"""
+import argparse
+import io
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import wave
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_RATE = 22050
+SECONDS_PER_WORD = 0.4  # Roughly 150 words per minute of narration
+
+SENTENCES = [
+    "The floorboards creaked somewhere above me, although I lived alone.",
+    "I told myself it was the old house settling into the cold night.",
+    "Then the footsteps stopped right outside my bedroom door.",
+    "Something breathed slowly on the other side of the thin wood.",
+    "When I finally opened it, the hallway was empty and the attic hatch hung open.",
+]
+
+
+def fake_story(word_count):
+    words = []
+    while len(words) < word_count:
+        for sentence in SENTENCES:
+            words.extend(sentence.split())
+    return " ".join(words[:word_count]).rstrip(",") + "."
+
+
+@lru_cache(maxsize=4)
+def _one_second_of_speech(sample_rate):
+    frames = bytearray()
+    for i in range(sample_rate):
+        t = i / sample_rate
+        # A 220 Hz tone pulsed at 3 Hz so the loudness varies like syllables
+        envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 3 * t)
+        sample = int(8000 * envelope * math.sin(2 * math.pi * 220 * t))
+        frames += sample.to_bytes(2, "little", signed=True)
+    return bytes(frames)
+
+
+def synthetic_speech(text, seconds_per_word=SECONDS_PER_WORD, sample_rate=SAMPLE_RATE):
+    """
+    Returns WAV bytes of a speech-like tone whose length scales with the word count of `text`.
+    """
+    duration = max(0.2, len(text.split()) * seconds_per_word)
+    frame_count = int(duration * sample_rate)
+    # Both the tone and its envelope repeat every second, so one second can simply be tiled
+    second = _one_second_of_speech(sample_rate)
+    frames = (second * (frame_count // sample_rate + 1))[:frame_count * 2]
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    latency = 0.0  # Extra seconds of delay per request, to mimic a remote API
+    seconds_per_word = SECONDS_PER_WORD
+    tts_seconds_per_char = 0.0  # Synthesis time that grows with the text, like the real TTS API
+    error_rate = 0.0  # Share of requests answered with 429 or 503, to exercise retries
+    fail_first = 0  # The first this many requests fail with fail_status, for a failure that doesn't depend on luck
+    fail_status = 503
+    retry_after = None  # Retry-After seconds sent with every injected failure
+    tail_rate = 0.0  # Share of requests delayed by tail_latency, to exercise hedging
+    tail_latency = 0.0
+    random = random.Random(0)  # Seeded so failure patterns repeat between runs
+    request_numbers = itertools.count()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+        payload = json.loads(body or b"{}")
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_first and next(self.request_numbers) < self.fail_first:
+            self._send_error_status(self.fail_status)
+            return
+        if self.error_rate and self.random.random() < self.error_rate:
+            self._send_error_status(self.random.choice([429, 503]))
+            return
+        if self.tail_rate and self.random.random() < self.tail_rate:
+            time.sleep(self.tail_latency)
+
+        if self.path.endswith("/chat/completions"):
+            self._send_chat_completion(payload)
+        elif "/text-to-speech/" in self.path:
+            self._send_speech(payload)
+        else:
+            self.send_error(404)
+
+    def _send_chat_completion(self, payload):
+        word_count = payload.get("max_tokens", 700)
+        story = fake_story(word_count)
+        if payload.get("stream"):
+            self._stream_chat_completion(payload, story)
+            return
+        response = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": story},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": word_count, "total_tokens": word_count},
+        }
+        self._send_bytes(json.dumps(response).encode(), "application/json")
+
+    def _stream_chat_completion(self, payload, story):
+        # Server-sent events, one word per delta, like the real streaming API
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = story.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": None,
+                }],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _send_speech(self, payload):
+        text = payload.get("text", "")
+        if self.tts_seconds_per_char:
+            time.sleep(len(text) * self.tts_seconds_per_char)
+        audio = synthetic_speech(text, seconds_per_word=self.seconds_per_word)
+        self._send_bytes(audio, "audio/wav")
+
+    def _send_error_status(self, status):
+        data = json.dumps({"error": {"message": "Injected failure", "code": status}}).encode()
+        self.send_response(status)
+        if self.retry_after is not None:
+            self.send_header("Retry-After", str(self.retry_after))
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_bytes(self, data, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_server(port=0, latency=0.0, seconds_per_word=SECONDS_PER_WORD, tts_seconds_per_char=0.0,
+                      error_rate=0.0, tail_rate=0.0, tail_latency=0.0, seed=0, fail_first=0, fail_status=503,
+                      retry_after=None):
+    """
+    Starts the fake provider server on a background thread and returns (server, base_url).
+    Use the returned base_url for both OPENAI_BASE_URL and ELEVENLABS_API_URL.
+    """
+    handler = type("ConfiguredFakeProviderHandler", (FakeProviderHandler,),
+                   {"latency": latency, "seconds_per_word": seconds_per_word,
+                    "tts_seconds_per_char": tts_seconds_per_char, "error_rate": error_rate,
+                    "tail_rate": tail_rate, "tail_latency": tail_latency, "random": random.Random(seed),
+                    "fail_first": fail_first, "fail_status": fail_status, "retry_after": retry_after,
+                    "request_numbers": itertools.count()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run fake OpenAI/ElevenLabs endpoints locally.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server(args.port, args.latency)
+    print(f"Fake providers listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
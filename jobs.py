@@ -0,0 +1,124 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    """
+    A single story generation request tracked by the JobQueue.
+    """
+    def __init__(self, params):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.timings = {}  # Seconds spent in each pipeline stage
+        self.trace = None  # Optional metrics.Trace filled in by the pipeline
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 3)
+
+    def to_dict(self, include_trace=False):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "timings": dict(self.timings),
+        }
+        if self.started_at is not None:
+            data["queue_wait"] = round(self.started_at - self.created_at, 3)
+        if self.finished_at is not None:
+            data["total"] = round(self.finished_at - self.created_at, 3)
+        if self.error is not None:
+            data["error"] = self.error
+        if include_trace and self.trace is not None:
+            data["trace"] = self.trace.to_dict()
+        return data
+
+
+class JobQueue:
+    """
+    Runs `pipeline(job)` on a bounded pool of worker threads.
+    At most `max_queue_depth` jobs may wait for a worker; beyond that submit() raises QueueFullError.
+    Whatever the pipeline returns is stored on job.result.
+    """
+    def __init__(self, pipeline, max_workers=2, max_queue_depth=16, keep_finished=256):
+        self._pipeline = pipeline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="story-job")
+        self._max_queue_depth = max_queue_depth
+        self._keep_finished = keep_finished
+        self._jobs = OrderedDict()
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def submit(self, params):
+        with self._lock:
+            if self._queued >= self._max_queue_depth:
+                raise QueueFullError(f"Job queue is full ({self._max_queue_depth} jobs waiting).")
+            job = Job(params)
+            self._jobs[job.id] = job
+            self._queued += 1
+            self._evict_finished()
+        self._executor.submit(self._run, job)
+        return job
+
+    def add_done(self, params, result):
+        """
+        Registers a job whose result was already available (e.g. from the warm pool) without running the pipeline.
+        """
+        job = Job(params)
+        job.started_at = job.finished_at = job.created_at
+        job.result = result
+        job.status = "done"
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+            return {"queued": self._queued, "running": running, "max_queue_depth": self._max_queue_depth}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job):
+        with self._lock:
+            self._queued -= 1
+        job.started_at = time.time()
+        job.status = "running"
+        try:
+            job.result = self._pipeline(job)
+            job.status = "done"
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _evict_finished(self):
+        # Drop the oldest finished jobs so the registry doesn't grow without bound
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self._keep_finished)]:
+            del self._jobs[job_id]
@@ -0,0 +1,153 @@
+import numpy as np
+from pydub.utils import ratio_to_db
+
+WINDOW_MS = 50  # Envelope resolution; short enough to find the pauses between sentences
+CHUNK_FRAMES = 1 << 18  # Frames squared per step, so temporaries stay small on long tracks
+SILENCE_DB = -200.0  # Level given to silent windows
+
+# Sidechain ducking defaults
+SPEECH_THRESHOLD_DB = 18  # Windows this far below the narration's overall level count as pauses
+HOLD_MS = 400  # Keeps the music down through the short gaps between words
+RAMP_MS = 300  # Length of the fades between ducked and full level
+
+
+class Envelope:
+    """
+    Loudness of a track over fixed windows of about `window_ms`, kept as one sum of squared samples per window.
+
+    add() takes the samples in one pass, block by block if need be. The level of the whole track and of every
+    window then come from these sums, without another pass over the samples.
+    """
+    def __init__(self, frame_rate, channels, sample_width, window_ms=WINDOW_MS):
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.window_frames = max(1, round(frame_rate * window_ms / 1000))
+        self.max_possible_amplitude = float(1 << (8 * sample_width - 1))
+        self.frames = 0
+        self._sums = []
+        self._partial = np.empty(0)
+
+    @classmethod
+    def of(cls, samples, frame_rate, channels, sample_width, window_ms=WINDOW_MS):
+        envelope = cls(frame_rate, channels, sample_width, window_ms)
+        envelope.add(samples)
+        return envelope
+
+    @property
+    def duration(self):
+        return self.frames / self.frame_rate
+
+    def add(self, samples):
+        """
+        Adds interleaved samples that follow on from the previous call.
+        """
+        window_samples = self.window_frames * self.channels
+        self.frames += len(samples) // self.channels
+        position = 0
+        if len(self._partial):
+            # Complete the window left open by the previous block
+            position = window_samples - len(self._partial)
+            self._partial = np.concatenate((self._partial, samples[:position].astype(np.float64)))
+            if len(self._partial) < window_samples:
+                return
+            self._sums.append(np.array([np.dot(self._partial, self._partial)]))
+
+        whole = position + (len(samples) - position) // window_samples * window_samples
+        step = window_samples * max(1, CHUNK_FRAMES // self.window_frames)
+        for start in range(position, whole, step):
+            chunk = samples[start:min(start + step, whole)].astype(np.float64).reshape(-1, window_samples)
+            self._sums.append(np.einsum("ij,ij->i", chunk, chunk))
+        self._partial = samples[whole:].astype(np.float64)
+
+    def square_sums(self):
+        """
+        Sum of squared samples per window; the last window may be shorter than the others.
+        """
+        if len(self._sums) != 1:
+            self._sums = [np.concatenate(self._sums) if self._sums else np.empty(0)]
+        if len(self._partial):
+            return np.append(self._sums[0], np.dot(self._partial, self._partial))
+        return self._sums[0]
+
+    def square_sum(self):
+        return float(self.square_sums().sum())
+
+    def dBFS(self):
+        # Integer RMS like audioop.rms, so this matches pydub's AudioSegment.dBFS
+        samples = self.frames * self.channels
+        rms = int((self.square_sum() / samples) ** 0.5) if samples else 0
+        if not rms:
+            return -float("infinity")
+        return ratio_to_db(rms / self.max_possible_amplitude)
+
+    def window_dBFS(self):
+        sums = self.square_sums()
+        counts = np.full(len(sums), float(self.window_frames * self.channels))
+        if len(self._partial):
+            counts[-1] = len(self._partial)
+        rms = np.sqrt(sums / counts) / self.max_possible_amplitude
+        # Digital silence gets SILENCE_DB instead of -inf, so arithmetic on levels stays finite
+        return np.maximum(20 * np.log10(np.maximum(rms, 1e-12)), SILENCE_DB)
+
+    def levels_at(self, seconds, loop=False):
+        """
+        Window levels at the given times. Past the end the track is silent, or starts over when `loop` is set.
+        """
+        levels = np.append(self.window_dBFS(), SILENCE_DB)
+        if loop and self.frames:
+            seconds = np.mod(seconds, self.duration)
+        index = (np.asarray(seconds) * self.frame_rate // self.window_frames).astype(np.int64)
+        return levels[np.minimum(index, len(levels) - 1)]
+
+
+class GainCurve:
+    """
+    A gain that changes over time, given as one factor per window.
+    Like pydub's fades, it moves in steps of about a millisecond, interpolated linearly between window centers.
+    """
+    def __init__(self, window_gains, window_frames, frame_rate):
+        self.window_gains = np.asarray(window_gains, dtype=np.float64)
+        self.window_frames = window_frames
+        self.step_frames = max(1, frame_rate // 1000)
+        self._centers = (np.arange(len(self.window_gains)) + 0.5) * window_frames
+
+    def factors(self, first_frame, end_frame, channels=1):
+        """
+        One factor per interleaved sample of frames `first_frame` to `end_frame`.
+        """
+        first_step = first_frame // self.step_frames
+        steps = np.arange(first_step, -(-end_frame // self.step_frames))
+        values = np.interp((steps + 0.5) * self.step_frames, self._centers, self.window_gains)
+        offset = (first_frame - first_step * self.step_frames) * channels
+        return np.repeat(values, self.step_frames * channels)[offset:offset + (end_frame - first_frame) * channels]
+
+
+def ducking_curve(narration, music, frame_rate, total_frames, base_gain_db, duck_db,
+                  threshold_db=SPEECH_THRESHOLD_DB, hold_ms=HOLD_MS, ramp_ms=RAMP_MS, window_ms=WINDOW_MS):
+    """
+    Gain for the looped `music` bed that dips while the narration speaks and comes back up in the pauses.
+
+    `narration` and `music` are Envelopes; the bed is `base_gain_db` louder than the music track.
+    Under speech, windows where the bed is louder than `duck_db` below its average level are pulled down to
+    that level, so loud passages of the music duck and quiet ones are left alone.
+    Output frames are at `frame_rate`; the curve covers `total_frames` of them.
+    """
+    window_frames = max(1, round(frame_rate * window_ms / 1000))
+    windows = -(-total_frames // window_frames)
+    seconds = (np.arange(windows) + 0.5) * window_frames / frame_rate
+
+    narration_dBFS = narration.dBFS()
+    if narration_dBFS == -float("infinity"):
+        return GainCurve(np.full(windows, 10 ** (base_gain_db / 20)), window_frames, frame_rate)
+    speech = narration.levels_at(seconds) > narration_dBFS - threshold_db
+
+    # Hold the activity over short gaps, then ramp it; the centered ramp starts ducking just ahead of speech
+    hold = max(0, round(hold_ms / window_ms))
+    held = np.convolve(speech, np.ones(hold + 1), "full")[:windows] > 0
+    ramp = max(1, round(ramp_ms / window_ms))
+    activity = np.convolve(held.astype(np.float64), np.ones(ramp) / ramp, "same")
+
+    bed_levels = music.levels_at(seconds, loop=True) + base_gain_db
+    target = music.dBFS() + base_gain_db - duck_db
+    gains_db = base_gain_db - activity * np.maximum(0.0, bed_levels - target)
+    return GainCurve(10 ** (gains_db / 20), window_frames, frame_rate)
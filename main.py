@@ -1,33 +1,31 @@
 import os
-from openai import OpenAI
 from dotenv import load_dotenv
-import requests
-from pydub import AudioSegment
-import random
-from moviepy.editor import (
-    AudioFileClip,
-    ImageClip,
-    concatenate_videoclips,
-)
+import uuid
+from functools import lru_cache
+from artifacts import ArtifactStore
+from cache import ResultCache, cache_key
+import json
+import metrics
+import argparse
+from providers import ClientFactory, Provider, SpeechClient, StoryClient, require_api_key
+
+# pydub, NumPy, the video stack and the provider SDKs are imported by the steps that use them,
+# so short runs and worker processes start quickly; see benchmarks/bench_import_time.py
 
 load_dotenv()
 
-# Retreive API keys
-XI_API_KEY = os.getenv("XI_API_KEY")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-if not OPENAI_API_KEY:
-    raise ValueError("OpenAI API key not found in environment variables.")
-if not XI_API_KEY:
-    raise ValueError("ElevenLabs API key not found in environment variables.")
-
 # Important constants
 VOICE_ID = "t7VcunDELSXwqBUqGfc7"
+VOICE_SETTINGS = {
+    "stability": 0.95,
+    "similarity_boost": 0.95,
+    "style": 0.0,
+    "use_speaker_boost": True
+}
 OPEN_AI_MODEL = "gpt-4o"
 
 STORY_WORD_COUNT = 300  # Desired length of the horror story
 OUTPUT_TTS_PATH = "story_tts.mp3"
-CHUNK_SIZE = 1024  # Size of chunks to read/write at a time
 
 BACKGROUND_MUSIC_FOLDER = "background_music/"
 FINAL_OUTPUT_AUDIO_PATH = "final_output_audio.mp3"
@@ -38,10 +36,39 @@ VIDEO_SIZE = (1280, 720)  # Video resolution (width, height)
 FINAL_VIDEO_PATH = "final_output_video.mp4"
 IMAGES_FOLDER = "images/"
 
-# Initialize OpenAI API
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-def generate_horror_story(word_count=800):
+# CLI results are kept until the user deletes them, in a folder of their own so the server's expiry never reaches them
+OUTPUT_FOLDER = os.getenv("OUTPUT_FOLDER", "outputs/")
+CACHE_FOLDER = os.getenv("CACHE_FOLDER", "cache/")  # Narrations are reused when the same text is read again
+
+# Provider endpoints and limits, shared with app.py; see fake_providers.py for running offline
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+ELEVENLABS_API_URL = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io/v1")
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 4))
+ELEVENLABS_MAX_CONCURRENCY = int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", 4))
+PROVIDER_RETRIES = int(os.getenv("PROVIDER_RETRIES", 3))
+
+# Narrations at least this long are mixed block by block, as in app.py; 0 streams every mix
+STREAMING_MIX_SECONDS = float(os.getenv("STREAMING_MIX_SECONDS", 600))
+MUSIC_DUCK_DB = float(os.getenv("MUSIC_DUCK_DB", 6))  # Music dip under speech, as in app.py
+
+# Clients are built, and the API keys checked, on first use
+story_client = ClientFactory(lambda: StoryClient(
+    require_api_key("OPENAI_API_KEY", "OpenAI"), OPENAI_BASE_URL,
+    Provider("openai", max_concurrency=OPENAI_MAX_CONCURRENCY, retries=PROVIDER_RETRIES)))
+speech_client = ClientFactory(lambda: SpeechClient(
+    require_api_key("XI_API_KEY", "ElevenLabs"), ELEVENLABS_API_URL,
+    Provider("elevenlabs", max_concurrency=ELEVENLABS_MAX_CONCURRENCY, retries=PROVIDER_RETRIES)))
+
+tts_cache = ResultCache(os.path.join(CACHE_FOLDER, "tts"))
+
+@lru_cache(maxsize=None)
+def frame_cache():
+    # Letterboxed slideshow images, decoded once per process
+    from video import FrameCache
+    return FrameCache()
+
+@metrics.stage("story")
+def generate_horror_story(word_count=800, title=None):
     
     exemplary_story = """
         I’m not going to call myself an expert hiker, but I’ve been avidly enjoying the activity for a few decades now. I’ve traversed all the major trails in America, and I’ve been to over 75% of this beautiful country’s national parks. As such, I’ve had to find new ways to excite myself. I recently picked up a new hobby: scouring Google Maps for vast unnamed forests and just exploring them. It’s a little unconventional, but I think the added excitement is worth the risk of getting lost. Or at least I did. I carry a pack of homemade route-marking stickers that I periodically slap onto trees so I don’t forget my way back. As I pass each one, I pull them off the trees so as not to leave any litter behind. I’m surprised more people haven’t picked up on this trick. It makes getting lost in a forest nearly impossible.
@@ -66,13 +93,13 @@ def generate_horror_story(word_count=800):
      """
      
     prompt = (
-        f"""Write a first-person, bone-chilling, atmospheric horror story centered around a paranormal activity occurrence in exactly {word_count} words. The story should start with a very relatable scenario, such as a person settling in for the night after a long day, or staying in a remote cabin for a weekend getaway. Then, something paranormal or sinister happens, like hearing footsteps in the attic or seeing a shadowy figure outside the window. Focus on setting the scene in a quiet, isolated home at night, where every creak and shadow feeds into the protagonist's growing fear. Incorporate eerie, sensory details like the sound of footsteps in the dark, the glint of light on unfamiliar objects, or whispers from unseen corners. The intruder's presence should be felt throughout the narrative, creating an overwhelming sense of helplessness and terror. The protangonist eventually confronts the intruder, leading to a chilling climax that leaves the reader with a lingering sense of dread. The protagonist is alive, and is able to report to the police. However, the intruder is never caught and said to be still lingering around for the next victim. The story should be suitable for audio narration, ensuring every word adds to the suspense and ultimate horror of the protagonist's fate.
+        f"""Write a first-person, bone-chilling, atmospheric horror story{f' titled "{title}"' if title else ''} centered around a paranormal activity occurrence in exactly {word_count} words. The story should start with a very relatable scenario, such as a person settling in for the night after a long day, or staying in a remote cabin for a weekend getaway. Then, something paranormal or sinister happens, like hearing footsteps in the attic or seeing a shadowy figure outside the window. Focus on setting the scene in a quiet, isolated home at night, where every creak and shadow feeds into the protagonist's growing fear. Incorporate eerie, sensory details like the sound of footsteps in the dark, the glint of light on unfamiliar objects, or whispers from unseen corners. The intruder's presence should be felt throughout the narrative, creating an overwhelming sense of helplessness and terror. The protangonist eventually confronts the intruder, leading to a chilling climax that leaves the reader with a lingering sense of dread. The protagonist is alive, and is able to report to the police. However, the intruder is never caught and said to be still lingering around for the next victim. The story should be suitable for audio narration, ensuring every word adds to the suspense and ultimate horror of the protagonist's fate.
         
         Consult this story for example: {exemplary_story}
         """
     )
     
-    response = client.chat.completions.create(
+    story = story_client().complete(
         model="gpt-4",
         messages=[
             {"role": "system", "content": "You are a creative and imaginative writer specializing in horror stories."},
@@ -81,179 +108,216 @@ def generate_horror_story(word_count=800):
         max_tokens=word_count,  # Approximate token count for the desired word count
         temperature=0.8,
     )
-    
-    story = response.choices[0].message.content
+    metrics.record_bytes("openai", len(story.encode("utf-8")))
     return story
 
-def text_to_speech(text, output_path, voice_id, model_id="eleven_multilingual_v2"):
+@metrics.stage("tts")
+def text_to_speech(text, output_path, voice_id, model_id="eleven_multilingual_v2", fresh=False):
     """
     Converts text to speech using ElevenLabs API and saves the audio to the specified path.
+    The same text, voice and settings are served from the TTS cache unless `fresh` is set.
     """
-    tts_url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream"
-    
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "xi-api-key": XI_API_KEY
-    }
-    
-    data = {
-        "text": text,
-        "model_id": model_id,
-        "voice_settings": {
-            "stability": 0.95,
-            "similarity_boost": 0.95,
-            "style": 0.0,
-            "use_speaker_boost": True
-        }
-    }
-    
-    response = requests.post(tts_url, headers=headers, json=data, stream=True)
-    
-    if response.ok:
+    key = cache_key("tts", text, voice_id, model_id, VOICE_SETTINGS)
+    cached = None if fresh else tts_cache.get(key)
+    if not fresh:
+        metrics.record_cache("tts", cached is not None)
+    if cached is not None:
         with open(output_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-                if chunk:
-                    f.write(chunk)
-        print("TTS audio saved successfully.")
-    else:
-        raise Exception(f"ElevenLabs TTS API Error: {response.text}")
+            f.write(cached)
+        print("TTS audio loaded from cache.")
+        return
+    
+    audio = speech_client().speech(text, voice_id, model_id, VOICE_SETTINGS)
+    with open(output_path, "wb") as f:
+        f.write(audio)
+    metrics.record_bytes("elevenlabs", len(audio))
+    tts_cache.put(key, audio)
+    print("TTS audio saved successfully.")
 
 #####
 
+@metrics.stage("mix")
 def mix_audio(tts_path, music_folder, output_path):
-    tts_audio = AudioSegment.from_file(tts_path)
+    from pydub import AudioSegment
+    from music_library import get_music_library
+    from mixing import mix_files, mix_tracks, probe_audio
+
+    # Decoded, measured and pre-looped once per track by the music library
+    track = get_music_library(music_folder).choose()
+    narration = probe_audio(tts_path)
+    if not STREAMING_MIX_SECONDS or narration["seconds"] >= STREAMING_MIX_SECONDS:
+        # Long narrations never sit in memory whole
+        with metrics.audio_codec("streaming_mix"):
+            narration_seconds, mixed_seconds = mix_files(tts_path, track, output_path, gain_offset_db=-12,
+                                                         duck_db=MUSIC_DUCK_DB, narration=narration)
+        metrics.record_audio("narration", narration_seconds)
+        metrics.record_audio("mixed", mixed_seconds)
+        print(f"Mixed audio exported successfully ")
+        return mixed_seconds
+
+    with metrics.audio_codec("decode"):
+        tts_audio = AudioSegment.from_file(tts_path)
+    metrics.record_audio("narration", len(tts_audio) / 1000)
     
-    music_files = [file for file in os.listdir(music_folder) if file.lower().endswith(('.mp3', '.wav', '.ogg', '.flac', '.m4a'))]
-    chosen_music_file = os.path.join(music_folder, random.choice(music_files))
-    background_music = AudioSegment.from_file(chosen_music_file)
-    
-    total_duration = len(tts_audio) + 5000
-    background_music = (background_music * ((total_duration // len(background_music)) + 1))[:total_duration]
-    print(f"The background music db is {background_music.dBFS}")
-    print(f"The tts_music db is: {tts_audio.dBFS}")
-    background_music += (tts_audio.dBFS - background_music.dBFS - 12) # Ensure a 12 unit dB difference
-    print(f"after change {background_music.dBFS}")
-    mixed_audio = background_music.overlay(tts_audio)
-    mixed_audio = mixed_audio.fade_out(6000)
-    mixed_audio.export(output_path, format='mp3')
+    mixed_audio = mix_tracks(tts_audio, track, gain_offset_db=-12, duck_db=MUSIC_DUCK_DB) # Ensure a 12 unit dB difference
+    with metrics.audio_codec("encode"):
+        mixed_audio.export(output_path, format='mp3')
+    metrics.record_audio("mixed", len(mixed_audio) / 1000)
     print(f"Mixed audio exported successfully ")
+    return len(mixed_audio) / 1000
 
-def create_video_with_images(audio_path, images_folder, output_video_path, display_duration_range=(30, 45), transition_duration=2, video_size=(1280, 720)):
+@metrics.stage("video")
+def create_video_with_images(audio_path, images_folder, output_video_path, display_duration_range=(30, 45), transition_duration=2, video_size=(1280, 720), fps=24):
     """
     Creates a video by combining a slideshow of images with the provided audio.
     Each image is displayed for a random duration within the specified range, with fade transitions.
     Ensures the video resolution is set to 1280x720.
+    The whole timeline is planned before rendering, each image is decoded and letterboxed once,
+    and the frames are piped straight into ffmpeg in a single pass.
     """
-    # Load the audio file
-    audio_clip = AudioFileClip(audio_path)
-    audio_duration = audio_clip.duration
-    print(f"Audio duration: {audio_duration} seconds")
-    
-    # Get list of images
-    image_files = [os.path.join(images_folder, file) for file in os.listdir(images_folder)
-                   if file.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))]
-    if not image_files:
-        raise ValueError("No image files found in the specified images folder.")
-    
-    # Calculate total number of images needed based on audio duration and display duration range
-    avg_display_duration = sum(display_duration_range) / 2
-    num_images = max(1, int(audio_duration / avg_display_duration))
-    print(f"Number of images to display: {num_images}")
-    
-    # Randomly select images
-    selected_images = random.choices(image_files, k=num_images)
-    
-    # Create ImageClips with random display durations
-    clips = []
-    for img_path in selected_images:
-        display_duration = random.uniform(*display_duration_range)
-        img_clip = ImageClip(img_path).set_duration(display_duration)
-        
-        # Resize the image, maintaining aspect ratio, and fit within 1280x720
-        img_clip = img_clip.resize(height=video_size[1])
-        if img_clip.w > video_size[0]:
-            img_clip = img_clip.resize(width=video_size[0])
-        
-        # Pad the image to fit exactly 1280x720 if necessary
-        img_clip = img_clip.on_color(size=video_size, color=(0, 0, 0), pos='center')
+    from pydub.utils import mediainfo
+    from video import Slideshow, list_images, plan_timeline, render_slideshow
 
-        # Apply fade-in and fade-out
-        img_clip = img_clip.fadein(transition_duration).fadeout(transition_duration)
-        
-        clips.append(img_clip)
-    
-    # Concatenate ImageClips with crossfade transitions
-    video = concatenate_videoclips(clips, method="compose", padding=-transition_duration)
-    
-    # Ensure the video duration matches the audio duration
-    if video.duration < audio_duration:
-        # Calculate how much more time is needed
-        additional_duration = audio_duration - video.duration
-        additional_images = random.choices(image_files, k=int(additional_duration / avg_display_duration) + 1)
-        for img_path in additional_images:
-            display_duration = random.uniform(*display_duration_range)
-            img_clip = ImageClip(img_path).set_duration(display_duration)
-            
-            # Resize and pad the image to fit 1280x720
-            img_clip = img_clip.resize(height=video_size[1])
-            if img_clip.w > video_size[0]:
-                img_clip = img_clip.resize(width=video_size[0])
-            img_clip = img_clip.on_color(size=video_size, color=(0, 0, 0), pos='center')
-            
-            # Apply fade-in and fade-out
-            img_clip = img_clip.fadein(transition_duration).fadeout(transition_duration)
-            
-            clips.append(img_clip)
-            video = concatenate_videoclips([video, img_clip], method="compose", padding=-transition_duration)
-            if video.duration >= audio_duration:
-                break
+    audio_duration = float(mediainfo(audio_path)["duration"])
+    print(f"Audio duration: {audio_duration} seconds")
     
-    video = video.subclip(0, audio_duration)
+    image_files = list_images(images_folder)
     
-    # Add audio to the video
-    final_video = video.set_audio(audio_clip)
+    # Plan every slide (image, start, end) up front; consecutive slides overlap by the transition
+    slides = plan_timeline(audio_duration, image_files, display_duration_range, transition_duration)
+    print(f"Number of images to display: {len(slides)}")
     
-    # Write the final video to a file
-    final_video.write_videofile(output_video_path, codec="libx264", audio_codec="aac", fps=24)
+    slideshow = Slideshow(slides, video_size, transition_duration, frame_cache())
+    render_slideshow(audio_path, audio_duration, slideshow, output_video_path, fps=fps)
     print(f"Final video saved successfully as {output_video_path}.")
     
 def main():
-    try:
-        print("Generating horror story...")
-        story = generate_horror_story(word_count=STORY_WORD_COUNT)
-        print("Horror story generated successfully.\n")
-        print("Story Content:\n")
-        print(story)
+    # Every run works in its own folder so several runs can share one machine
+    artifact_store = ArtifactStore(OUTPUT_FOLDER, ttl_seconds=None, max_bytes=None)
+    run_id = uuid.uuid4().hex
+    run_folder = artifact_store.job_dir(run_id)
+    tts_path = os.path.join(run_folder, OUTPUT_TTS_PATH)
+    final_audio_path = os.path.join(run_folder, FINAL_OUTPUT_AUDIO_PATH)
+    final_video_path = os.path.join(run_folder, FINAL_VIDEO_PATH)
+    trace = metrics.Trace()
+    audio_artifact = None
+
+    with metrics.tracing(trace):
+        try:
+            print("Generating horror story...")
+            story = generate_horror_story(word_count=STORY_WORD_COUNT)
+            print("Horror story generated successfully.\n")
+            print("Story Content:\n")
+            print(story)
         
-        print("\nConverting story to speech...")
-        text_to_speech(story, OUTPUT_TTS_PATH, VOICE_ID)
+            print("\nConverting story to speech...")
+            text_to_speech(story, tts_path, VOICE_ID)
         
-        print("\nMixing TTS audio with background music...")
-        mix_audio(tts_path=OUTPUT_TTS_PATH,
-                  music_folder=BACKGROUND_MUSIC_FOLDER,
-                  output_path=FINAL_OUTPUT_AUDIO_PATH,
-                  )
+            print("\nMixing TTS audio with background music...")
+            mix_audio(tts_path=tts_path,
+                      music_folder=BACKGROUND_MUSIC_FOLDER,
+                      output_path=final_audio_path,
+                      )
         
-        print("\nCreating video with image slideshow and mixed audio...")
-        # create_video_with_images(
-        #     audio_path=FINAL_OUTPUT_AUDIO_PATH,
-        #     images_folder=IMAGES_FOLDER,
-        #     output_video_path=FINAL_VIDEO_PATH,
-        #     display_duration_range=IMAGE_DISPLAY_DURATION_RANGE,
-        #     transition_duration=TRANSITION_DURATION,
-        #     video_size=VIDEO_SIZE
-        # )
+            print("\nCreating video with image slideshow and mixed audio...")
+            # create_video_with_images(
+            #     audio_path=final_audio_path,
+            #     images_folder=IMAGES_FOLDER,
+            #     output_video_path=final_video_path,
+            #     display_duration_range=IMAGE_DISPLAY_DURATION_RANGE,
+            #     transition_duration=TRANSITION_DURATION,
+            #     video_size=VIDEO_SIZE
+            # )
         
-        print("\nProcess completed successfully!")
-        print(f"Final audio file saved as: {FINAL_OUTPUT_AUDIO_PATH}")
-        print(f"Final video file saved as: {FINAL_VIDEO_PATH}")
+            audio_artifact = artifact_store.path(artifact_store.commit(final_audio_path))
+            print("\nProcess completed successfully!")
+            print(f"Final audio file saved as: {audio_artifact}")
+            if os.path.exists(final_video_path):
+                video_artifact = artifact_store.path(artifact_store.commit(final_video_path))
+                print(f"Final video file saved as: {video_artifact}")
         
-    except Exception as e:
-        print(f"An error occurred: {e}")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        finally:
+            artifact_store.release_job(run_id)
+            print(f"\nTimings: {json.dumps(trace.to_dict())}")
+    # Used by benchmarks/bench_end_to_end.py
+    return {"audio": audio_artifact, "trace": trace.to_dict()}
+
+def write_batch_item(item, folder):
+    """
+    Network-bound half of a batch item: writes the story and narrates it.
+    Finished files are kept, so a resumed batch doesn't pay for them twice.
+    """
+    story_path = os.path.join(folder, "story.txt")
+    tts_path = os.path.join(folder, OUTPUT_TTS_PATH)
+    if os.path.exists(story_path):
+        with open(story_path, encoding="utf-8") as f:
+            story = f.read()
+    else:
+        story = generate_horror_story(word_count=item["word_count"], title=item["title"])
+        with open(story_path + ".part", "w", encoding="utf-8") as f:
+            f.write(story)
+        os.replace(story_path + ".part", story_path)
+
+    if not os.path.exists(tts_path):
+        text_to_speech(story, tts_path + ".part", item["voice_id"])
+        os.replace(tts_path + ".part", tts_path)
+    return {"story_words": len(story.split())}
+
+def render_batch_item(item, folder):
+    """
+    CPU-bound half of a batch item, run in a worker process: mixes the narration and renders the video.
+    """
+    final_audio_path = os.path.join(folder, FINAL_OUTPUT_AUDIO_PATH)
+    audio_seconds = mix_audio(tts_path=os.path.join(folder, OUTPUT_TTS_PATH),
+                              music_folder=BACKGROUND_MUSIC_FOLDER,
+                              output_path=final_audio_path)
+    outputs = [FINAL_OUTPUT_AUDIO_PATH]
+    if item["video"]:
+        create_video_with_images(
+            audio_path=final_audio_path,
+            images_folder=IMAGES_FOLDER,
+            output_video_path=os.path.join(folder, FINAL_VIDEO_PATH),
+            display_duration_range=IMAGE_DISPLAY_DURATION_RANGE,
+            transition_duration=TRANSITION_DURATION,
+            video_size=VIDEO_SIZE
+        )
+        outputs.append(FINAL_VIDEO_PATH)
+    output_bytes = sum(os.path.getsize(os.path.join(folder, name)) for name in outputs)
+    return {"audio_seconds": audio_seconds, "outputs": outputs, "output_bytes": output_bytes}
+
+def batch_main(manifest_path, output_folder, io_workers, cpu_workers):
+    from batch import load_manifest, run_batch
+
+    items = load_manifest(manifest_path, defaults={"word_count": STORY_WORD_COUNT, "voice_id": VOICE_ID, "video": False})
+    summary = run_batch(items, output_folder, write_batch_item, render_batch_item,
+                        io_workers=io_workers, cpu_workers=cpu_workers)
+    totals = summary["totals"]
+    print(f"\nBatch finished: {totals['generated']} generated, {totals['skipped']} skipped, {totals['failed']} failed "
+          f"in {totals['wall_seconds']:.1f}s ({totals['items_per_hour']} items/hour, "
+          f"{totals['audio_seconds_per_second']}s of audio per second).")
+    print(f"Summary written to {os.path.join(output_folder, 'summary.json')}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a narrated horror story, or many of them from a manifest.")
+    parser.add_argument("--batch", metavar="MANIFEST",
+                        help="CSV or JSONL manifest with title, word_count, voice_id and video columns")
+    parser.add_argument("--output-folder", default="batch_output/", help="Each batch item gets its own folder here")
+    parser.add_argument("--io-workers", type=int, default=4, help="Stories written and narrated at once")
+    parser.add_argument("--cpu-workers", type=int, default=None,
+                        help="Processes for mixing and video rendering (default: one per core)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    # Fail before any work starts when a key is missing
+    story_client()
+    speech_client()
+    if args.batch:
+        batch_main(args.batch, args.output_folder, args.io_workers, args.cpu_workers)
+    else:
+        main()
 
 
 
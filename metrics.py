@@ -0,0 +1,226 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; pipeline stages range from cached lookups to multi-minute video renders
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_values(self, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.label_names, key)), value
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_values(self, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        for key, state in sorted(values.items()):
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, state[-1]
+            yield f"{self.name}_sum", labels, state[-2]
+            yield f"{self.name}_count", labels, state[-1]
+
+
+class Registry:
+    """
+    Holds the process-wide metrics and renders them in the Prometheus text exposition format.
+    Collectors are callables returning (name, type, help, [(labels, value), ...]) tuples; they are
+    read at scrape time, for numbers that already live elsewhere (cache stats, queue depth).
+    """
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            kind = "counter" if isinstance(metric, Counter) else "histogram"
+            lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {kind}"]
+            lines += [_sample_line(name, labels, value) for name, labels, value in metric.samples()]
+        for collector in self._collectors:
+            for name, kind, help, samples in collector():
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                lines += [_sample_line(name, labels, value) for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """
+    Timings and counters for a single request, filled in by stage() and the record helpers below
+    while the trace is active (see tracing()).
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, seconds):
+        with self._lock:
+            self.spans.append({"name": name, "start": round(start - self.started, 3), "seconds": round(seconds, 3)})
+
+    def add(self, name, amount):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def to_dict(self):
+        with self._lock:
+            counters = {name: round(value, 3) if isinstance(value, float) else value
+                        for name, value in self.counters.items()}
+            return {"spans": list(self.spans), "counters": counters}
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram("story_stage_seconds", "Wall-clock time spent in each pipeline stage.", ["stage"])
+QUEUE_WAIT_SECONDS = registry.histogram("story_job_queue_wait_seconds", "Time jobs waited for a worker.")
+AUDIO_CODEC_SECONDS = registry.histogram("story_audio_codec_seconds", "Time spent decoding or encoding audio.",
+                                         ["operation"])
+PROVIDER_BYTES = registry.counter("story_provider_bytes_total", "Bytes received from the LLM and TTS providers.",
+                                  ["provider"])
+AUDIO_SECONDS = registry.counter("story_audio_seconds_total", "Seconds of audio produced.", ["kind"])
+CACHE_LOOKUPS = registry.counter("story_cache_lookups_total", "Result cache lookups seen by the pipeline.",
+                                 ["cache", "result"])
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def tracing(trace):
+    """
+    Makes `trace` the active trace for the enclosed code. Work handed to a thread pool keeps the trace
+    only if it is submitted with the caller's context (contextvars.copy_context().run).
+    """
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a pipeline stage into story_stage_seconds and the active trace. Also usable as a decorator.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=name)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_span(name, start, seconds)
+
+
+@contextmanager
+def audio_codec(operation):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        AUDIO_CODEC_SECONDS.observe(seconds, operation=operation)
+        _add_to_trace(f"{operation}_seconds", seconds)
+
+
+def record_bytes(provider, amount):
+    PROVIDER_BYTES.inc(amount, provider=provider)
+    _add_to_trace(f"{provider}_bytes", amount)
+
+
+def record_audio(kind, seconds):
+    AUDIO_SECONDS.inc(seconds, kind=kind)
+    _add_to_trace(f"{kind}_audio_seconds", seconds)
+
+
+def record_cache(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+    _add_to_trace(f"{cache}_cache_{'hits' if hit else 'misses'}", 1)
+
+
+def _add_to_trace(name, amount):
+    trace = current_trace()
+    if trace is not None:
+        trace.add(name, amount)
+
+
+def _label_values(metric, labels):
+    if set(labels) != set(metric.label_names):
+        raise ValueError(f"{metric.name} expects labels {metric.label_names}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in metric.label_names)
+
+
+def _sample_line(name, labels, value):
+    if labels:
+        rendered = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+        return f"{name}{{{rendered}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
@@ -0,0 +1,301 @@
+import subprocess
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import audioop, db_to_float, mediainfo_json
+
+from loudness import Envelope, GainCurve, ducking_curve
+from streaming import PCM_FORMATS
+
+# audioop treats every sample width as signed integers
+SAMPLE_TYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+BLOCK_FRAMES = 1 << 18  # Frames mixed per block, so temporaries stay small on long narrations
+
+
+def mix_tracks(tts_audio, track, gain_offset_db=-12, tail_ms=5000, fade_ms=6000, duck_db=0):
+    """
+    Mixes narration over a looped background track in one vectorized pass over NumPy buffers.
+
+    Without ducking, produces the same samples as the pydub chain it replaces:
+        bed = (music * n)[:len(tts_audio) + tail_ms]
+        bed += tts_audio.dBFS - bed.dBFS + gain_offset_db
+        mixed = bed.overlay(tts_audio).fade_out(fade_ms)
+    With `duck_db`, the bed also dips by about that much under speech (see loudness.ducking_curve).
+    `track` is a MusicTrack from the music library, which already knows the loudness of its looped bed.
+    """
+    music = track.audio
+    total_duration = len(tts_audio) + tail_ms
+    channels = max(music.channels, tts_audio.channels)
+    frame_rate = max(music.frame_rate, tts_audio.frame_rate)
+    sample_width = max(music.sample_width, tts_audio.sample_width)
+    if sample_width not in SAMPLE_TYPES:
+        background_music = track.bed(total_duration) + (tts_audio.dBFS - track.bed_dBFS(total_duration) + gain_offset_db)
+        return background_music.overlay(tts_audio).fade_out(fade_ms)
+
+    # The narration's envelope gives both its overall level and, for ducking, where the pauses are
+    narration = Envelope.of(_samples(tts_audio), tts_audio.frame_rate, tts_audio.channels, tts_audio.sample_width)
+    gain_db = narration.dBFS() - track.bed_dBFS(total_duration) + gain_offset_db
+
+    # Loop the bed straight into the output buffer
+    bed_frames = int(music.frame_count(ms=total_duration))
+    bed = np.empty(bed_frames * music.channels, dtype=SAMPLE_TYPES[music.sample_width])
+    _tile_into(bed, _samples(music))
+    gain = db_to_float(float(gain_db))
+
+    # overlay() first brings both segments to the widest format; only convert what actually differs
+    if (music.channels, music.frame_rate, music.sample_width) != (channels, frame_rate, sample_width):
+        if not duck_db:
+            _gain_and_overlay(bed, gain, None, music.sample_width)
+            gain = None
+        bed_segment = music._spawn(bed.tobytes())
+        bed = _samples(bed_segment.set_channels(channels).set_frame_rate(frame_rate).set_sample_width(sample_width))
+        bed_frames = len(bed) // channels
+    bed_segment_ms = round(1000 * bed_frames / frame_rate)
+    output = _fit_frames(bed, _frame_at(bed_segment_ms, frame_rate), channels)
+    if duck_db:
+        gain = ducking_curve(narration, track.envelope, frame_rate, len(output) // channels, gain_db, duck_db)
+
+    _gain_and_overlay(output, gain, _narration_samples(tts_audio, channels, frame_rate, sample_width), sample_width,
+                      channels)
+    output = _fade_out(output, fade_ms, frame_rate, channels, sample_width)
+    return AudioSegment(data=output.tobytes(), sample_width=sample_width, frame_rate=frame_rate, channels=channels)
+
+
+def _samples(segment):
+    return np.frombuffer(segment.raw_data, dtype=SAMPLE_TYPES[segment.sample_width])
+
+
+def _limits(sample_width):
+    info = np.iinfo(SAMPLE_TYPES[sample_width])
+    return info.min, info.max
+
+
+def _frame_at(ms, frame_rate):
+    # pydub converts millisecond positions to frames by truncation
+    return int(ms * frame_rate / 1000)
+
+
+def _fit_frames(samples, frames, channels):
+    # Slicing a segment by milliseconds can drop or (at most 2 ms of) silence-pad the last frames
+    if len(samples) == frames * channels and samples.flags.writeable:
+        return samples
+    output = np.zeros(frames * channels, dtype=samples.dtype)
+    count = min(len(samples), len(output))
+    output[:count] = samples[:count]
+    return output
+
+
+def _tile_into(destination, source, offset=0):
+    # Fills `destination` with `source` looped, starting `offset` samples into the loop
+    position = 0
+    offset %= len(source)
+    while position < len(destination):
+        count = min(len(source) - offset, len(destination) - position)
+        destination[position:position + count] = source[offset:offset + count]
+        position += count
+        offset = 0
+
+
+def _narration_samples(tts_audio, channels, frame_rate, sample_width):
+    narration = tts_audio.set_frame_rate(frame_rate).set_sample_width(sample_width)
+    if narration.channels == 1 and channels == 2:
+        # Same result as set_channels(2), without audioop's slow per-sample loop
+        return np.repeat(_samples(narration), 2)
+    return _samples(narration.set_channels(channels))
+
+
+def _gain_and_overlay(output, gain, narration, sample_width, channels=1, first_frame=0):
+    """
+    Applies `gain` to the bed and adds the narration on top, block by block and in place.
+    `gain` is a factor or a GainCurve, on which `output` starts at `first_frame`.
+    Rounds like audioop: mul() clips then rounds towards minus infinity, add() clips the sum.
+    """
+    low, high = _limits(sample_width)
+    overlap = min(len(output), len(narration)) if narration is not None else 0
+    last = len(output) if gain is not None else overlap
+    step = BLOCK_FRAMES * channels
+    for start in range(0, last, step):
+        end = min(start + step, last)
+        block = output[start:end].astype(np.float64)
+        if isinstance(gain, GainCurve):
+            block *= gain.factors(first_frame + start // channels, first_frame + end // channels, channels)
+            np.clip(np.floor(block, out=block), low, high, out=block)
+        elif gain is not None:
+            np.clip(np.floor(block * gain, out=block), low, high, out=block)
+        if start < overlap:
+            stop = min(end, overlap)
+            block[:stop - start] += narration[start:stop]
+            np.clip(block, low, high, out=block)
+        output[start:end] = block
+
+
+def _fade_out(output, fade_ms, frame_rate, channels, sample_width):
+    """
+    Matches AudioSegment.fade_out: the gain falls linearly from 1 to -120 dB in one step per millisecond.
+    Like pydub, frames past the last whole millisecond are dropped, so the result may be slightly shorter.
+    """
+    total_frames = len(output) // channels
+    end_ms = round(1000 * total_frames / frame_rate)
+    start_ms = end_ms - fade_ms
+    if fade_ms <= 100 or start_ms < 0:
+        faded = AudioSegment(data=output.tobytes(), sample_width=sample_width,
+                             frame_rate=frame_rate, channels=channels).fade_out(fade_ms)
+        return _samples(faded).copy()
+
+    boundaries = np.array([_frame_at(ms, frame_rate) for ms in range(start_ms, end_ms + 1)])
+    steps = np.arange(fade_ms)
+    factors = 1.0 + (db_to_float(-120) - 1.0) / fade_ms * steps
+    frame_gain = np.repeat(factors, np.diff(boundaries))
+
+    output = _fit_frames(output, boundaries[-1], channels)
+    low, high = _limits(sample_width)
+    region = output[boundaries[0] * channels:].reshape(-1, channels)
+    region[:] = np.clip(np.floor(region * frame_gain[:, None]), low, high)
+    return output
+
+
+def mix_files(tts_path, track, output_path, gain_offset_db=-12, tail_ms=5000, fade_ms=6000, duck_db=0,
+              narration=None):
+    """
+    Streaming version of mix_tracks for long narrations: reads `tts_path` and writes the MP3 to `output_path`
+    without ever holding the whole narration or mix in memory.
+
+    The narration is decoded twice through ffmpeg pipes, once to measure its loudness and once to mix it,
+    BLOCK_FRAMES at a time. Each block gets the looped bed, gain or ducking, overlay and fade like mix_tracks does and
+    goes straight to an ffmpeg MP3 encoder, so peak memory depends on the block size and the music track only.
+    `narration` is probe_audio(tts_path), for callers that already have it. Returns (narration seconds, mixed seconds).
+    """
+    music = track.audio
+    narration = narration or probe_audio(tts_path)
+    channels = max(music.channels, narration["channels"])
+    frame_rate = max(music.frame_rate, narration["frame_rate"])
+    sample_width = max(music.sample_width, narration["sample_width"])
+    # Mono narration over stereo music is the only up-mix handled block by block
+    if sample_width not in (2, 4) or (narration["channels"], channels) not in ((1, 1), (1, 2), (2, 2)) or fade_ms <= 100:
+        return _mix_in_memory(tts_path, track, output_path, gain_offset_db, tail_ms, fade_ms, duck_db)
+
+    # First pass: envelope, level and exact length of the narration as pydub would decode it
+    envelope = Envelope(narration["frame_rate"], narration["channels"], narration["sample_width"])
+    for block in _pcm_blocks(tts_path, narration["sample_width"], narration["frame_rate"], narration["channels"]):
+        envelope.add(block)
+    narration_ms = round(1000 * envelope.frames / narration["frame_rate"])
+    if narration_ms + tail_ms < fade_ms:
+        return _mix_in_memory(tts_path, track, output_path, gain_offset_db, tail_ms, fade_ms, duck_db)
+
+    total_duration = narration_ms + tail_ms
+    gain_db = envelope.dBFS() - track.bed_dBFS(total_duration) + gain_offset_db
+    gain = db_to_float(float(gain_db))
+    bed_source = music
+    if (music.channels, music.frame_rate, music.sample_width) != (channels, frame_rate, sample_width):
+        # Converted once per mix; mix_tracks converts the gained bed instead, which rounds slightly differently
+        bed_source = music.set_channels(channels).set_frame_rate(frame_rate).set_sample_width(sample_width)
+    bed_source = _samples(bed_source)
+
+    # Same lengths as mix_tracks: the bed is cut to whole milliseconds, the fade drops any trailing part-millisecond
+    bed_frames = int(total_duration * frame_rate / 1000)
+    output_frames = _frame_at(round(1000 * bed_frames / frame_rate), frame_rate)
+    end_ms = round(1000 * output_frames / frame_rate)
+    boundaries = np.array([_frame_at(ms, frame_rate) for ms in range(end_ms - fade_ms, end_ms + 1)])
+    factors = 1.0 + (db_to_float(-120) - 1.0) / fade_ms * np.arange(fade_ms)
+    total_frames = boundaries[-1]
+    if duck_db:
+        gain = ducking_curve(envelope, track.envelope, frame_rate, total_frames, gain_db, duck_db)
+
+    low, high = _limits(sample_width)
+    encoder = subprocess.Popen([
+        AudioSegment.converter, "-y", "-loglevel", "error",
+        "-f", PCM_FORMATS[sample_width], "-ar", str(frame_rate), "-ac", str(channels), "-i", "pipe:0",
+        "-f", "mp3", output_path,
+    ], stdin=subprocess.PIPE)
+    blocks = _narration_blocks(tts_path, narration, sample_width, frame_rate, channels)
+    try:
+        for start in range(0, total_frames, BLOCK_FRAMES):
+            end = min(start + BLOCK_FRAMES, total_frames)
+            output = np.empty((end - start) * channels, dtype=SAMPLE_TYPES[sample_width])
+            _tile_into(output, bed_source, start * channels)
+            _gain_and_overlay(output, gain, next(blocks, None), sample_width, channels, start)
+
+            if end > boundaries[0]:
+                first = max(start, boundaries[0])
+                steps = np.searchsorted(boundaries, np.arange(first, end), side="right") - 1
+                region = output[(first - start) * channels:].reshape(-1, channels)
+                region[:] = np.clip(np.floor(region * factors[steps][:, None]), low, high)
+            encoder.stdin.write(output.tobytes())
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise Exception(f"ffmpeg MP3 encoder exited with code {encoder.returncode}")
+    finally:
+        blocks.close()
+        if encoder.poll() is None:
+            encoder.kill()
+            encoder.wait()
+    return narration_ms / 1000, round(1000 * total_frames / frame_rate) / 1000
+
+
+def probe_audio(path):
+    """
+    Format and duration of the first audio stream in `path`, from a single quiet ffprobe run.
+    """
+    info = mediainfo_json(path)
+    stream = next(s for s in info["streams"] if s["codec_type"] == "audio")
+    # Same format choice as AudioSegment.from_file: compressed streams decode to 16-bit
+    bits = stream.get("bits_per_sample") or 16
+    if stream.get("sample_fmt") == "fltp" and stream.get("codec_name") in ("mp3", "mp4", "aac", "webm", "ogg"):
+        bits = 16
+    return {"sample_width": bits // 8, "frame_rate": int(stream["sample_rate"]), "channels": int(stream["channels"]),
+            "seconds": float(stream.get("duration") or info.get("format", {}).get("duration") or 0)}
+
+
+def _pcm_blocks(path, sample_width, frame_rate, channels):
+    """
+    Decodes `path` through an ffmpeg pipe and yields it as sample arrays of up to BLOCK_FRAMES frames.
+    """
+    process = subprocess.Popen([
+        AudioSegment.converter, "-loglevel", "error", "-i", path, "-vn",
+        "-f", PCM_FORMATS[sample_width], "-ar", str(frame_rate), "-ac", str(channels), "pipe:1",
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        block_bytes = BLOCK_FRAMES * channels * sample_width
+        for data in iter(lambda: process.stdout.read(block_bytes), b""):
+            yield np.frombuffer(data, dtype=SAMPLE_TYPES[sample_width])
+        if process.wait() != 0:
+            raise Exception(f"Decoding {path} failed: {process.stderr.read().decode(errors='ignore')}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _narration_blocks(path, narration, sample_width, frame_rate, channels):
+    """
+    Yields the narration in the output format, BLOCK_FRAMES frames at a time.
+    Converts like _narration_samples does; audioop carries its resampling state from one block to the next.
+    """
+    source_width, source_rate, source_channels = narration["sample_width"], narration["frame_rate"], narration["channels"]
+    block_samples = BLOCK_FRAMES * channels
+    pending = np.empty(0, dtype=SAMPLE_TYPES[sample_width])
+    state = None
+    for block in _pcm_blocks(path, source_width, source_rate, source_channels):
+        data = block.tobytes()
+        if source_rate != frame_rate:
+            data, state = audioop.ratecv(data, source_width, source_channels, source_rate, frame_rate, state)
+        if source_width != sample_width:
+            data = audioop.lin2lin(data, source_width, sample_width)
+        samples = np.frombuffer(data, dtype=SAMPLE_TYPES[sample_width])
+        if source_channels != channels:
+            samples = np.repeat(samples, 2)
+        pending = np.concatenate((pending, samples))
+        while len(pending) >= block_samples:
+            yield pending[:block_samples]
+            pending = pending[block_samples:]
+    if len(pending):
+        yield pending
+
+
+def _mix_in_memory(tts_path, track, output_path, gain_offset_db, tail_ms, fade_ms, duck_db):
+    # Short clips and formats the block mixer doesn't handle
+    tts_audio = AudioSegment.from_file(tts_path)
+    mixed_audio = mix_tracks(tts_audio, track, gain_offset_db, tail_ms, fade_ms, duck_db)
+    mixed_audio.export(output_path, format="mp3")
+    return len(tts_audio) / 1000, len(mixed_audio) / 1000
+
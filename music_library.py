@@ -0,0 +1,156 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import ratio_to_db
+
+from loudness import Envelope
+
+MUSIC_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.flac', '.m4a')
+
+
+class MusicTrack:
+    """
+    A decoded background track with its loudness and loudness envelope measured once.
+    bed() hands out slices of a pre-looped copy, so mixing never has to decode or tile the track again.
+    """
+    def __init__(self, path, audio):
+        self.path = path
+        self.audio = audio
+        self.rms = audio.rms
+        self.dBFS = ratio_to_db(self.rms / audio.max_possible_amplitude) if self.rms else -float("infinity")
+        self.envelope = Envelope.of(_samples(audio), audio.frame_rate, audio.channels, audio.sample_width)
+        self._square_sum = self.envelope.square_sum()
+        self._looped = audio
+        self._lock = threading.Lock()
+
+    @property
+    def size_bytes(self):
+        return len(self.audio.raw_data) + len(self._looped.raw_data)
+
+    def bed(self, duration_ms):
+        """
+        Returns the track looped and cut to exactly `duration_ms`, like `(track * n)[:duration_ms]`.
+        """
+        with self._lock:
+            if len(self._looped) < duration_ms:
+                # Grow geometrically so a run of slightly longer stories doesn't re-tile every time
+                target = max(duration_ms, 2 * len(self._looped))
+                self._looped = self.audio * ((target // len(self.audio)) + 1)
+            looped = self._looped
+        return looped[:duration_ms]
+
+    def bed_dBFS(self, duration_ms):
+        """
+        Loudness of bed(duration_ms), worked out from the cached energy of the track instead of a pass over the bed.
+        """
+        channels = self.audio.channels
+        track_frames = int(self.audio.frame_count())
+        bed_frames = int(self.audio.frame_count(ms=duration_ms))
+        full_loops, remainder_frames = divmod(bed_frames, track_frames)
+        square_sum = full_loops * self._square_sum
+        if remainder_frames:
+            square_sum += _square_sum(_samples(self.audio)[:remainder_frames * channels])
+        samples = bed_frames * channels
+        # Same integer RMS as audioop.rms, so the result equals pydub's dBFS of the looped bed
+        rms = int((square_sum / samples) ** 0.5) if samples else 0
+        if not rms:
+            return -float("infinity")
+        return ratio_to_db(rms / self.audio.max_possible_amplitude)
+
+
+class MusicLibrary:
+    """
+    Decodes background tracks on first use and keeps them in a size-bounded LRU cache.
+    The folder is re-listed at most every `rescan_interval` seconds; tracks that changed or
+    disappeared are dropped from the cache.
+    """
+    def __init__(self, folder, max_bytes=512 * 1024 ** 2, rescan_interval=5):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self._tracks = OrderedDict()
+        self._files = {}  # filename -> (mtime, size)
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+
+    def files(self):
+        with self._lock:
+            if time.time() - self._last_scan >= self.rescan_interval:
+                self._rescan()
+            return sorted(self._files)
+
+    def choose(self):
+        music_files = self.files()
+        if not music_files:
+            raise Exception("No background music files found.")
+        return self.get(random.choice(music_files))
+
+    def get(self, filename):
+        with self._lock:
+            track = self._tracks.get(filename)
+            if track is not None:
+                self._tracks.move_to_end(filename)
+                return track
+
+        # Decode outside the lock so other tracks can still be served meanwhile
+        path = os.path.join(self.folder, filename)
+        track = MusicTrack(path, AudioSegment.from_file(path))
+
+        with self._lock:
+            self._tracks[filename] = track
+            self._tracks.move_to_end(filename)
+            self._evict()
+        return track
+
+    def preload(self):
+        for filename in self.files():
+            self.get(filename)
+
+    def _rescan(self):
+        listing = {}
+        for file in os.listdir(self.folder):
+            if file.lower().endswith(MUSIC_EXTENSIONS):
+                stat = os.stat(os.path.join(self.folder, file))
+                listing[file] = (stat.st_mtime, stat.st_size)
+        for filename in list(self._tracks):
+            if listing.get(filename) != self._files.get(filename):
+                del self._tracks[filename]
+        self._files = listing
+        self._last_scan = time.time()
+
+    def _evict(self):
+        total = sum(track.size_bytes for track in self._tracks.values())
+        # Always keep the most recently used track, even if it alone is over budget
+        while total > self.max_bytes and len(self._tracks) > 1:
+            _, track = self._tracks.popitem(last=False)
+            total -= track.size_bytes
+
+
+def _samples(audio):
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[audio.sample_width]
+    return np.frombuffer(audio.raw_data, dtype=dtype)
+
+
+def _square_sum(samples):
+    samples = samples.astype(np.float64)
+    return float(np.dot(samples, samples))
+
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+
+def get_music_library(folder):
+    """
+    Returns the shared MusicLibrary for `folder`, creating it on first use.
+    """
+    key = os.path.abspath(folder)
+    with _libraries_lock:
+        if key not in _libraries:
+            _libraries[key] = MusicLibrary(folder)
+        return _libraries[key]
@@ -0,0 +1,382 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+
+# httpx and openai take most of a cold start to import, so they are only imported once a client is built;
+# asyncio likewise waits for the first async call
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+PROVIDER_REQUESTS = metrics.registry.counter("story_provider_requests_total",
+                                             "Provider calls by outcome (ok, retried, hedged, failed).",
+                                             ["provider", "outcome"])
+PROVIDER_SECONDS = metrics.registry.histogram("story_provider_request_seconds",
+                                              "Latency of provider calls, including retries and hedges.",
+                                              ["provider"])
+
+
+class ProviderError(Exception):
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+        self.status_code = response.status_code if response is not None else None
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` calls per second on average and bursts of up to `burst` calls.
+    reserve() takes a token and returns how long the caller has to wait before using it,
+    so the same bucket serves both threads (time.sleep) and coroutines (asyncio.sleep).
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class Provider:
+    """
+    Call policy for one upstream API, shared by every client of that API in the process.
+
+    - At most `max_concurrency` calls are in flight (thread callers and each event loop are counted separately).
+    - `requests_per_second` (optional) spaces calls out with a token bucket.
+    - Calls failing with a transient error (429, 5xx, timeouts, dropped connections) are retried
+      up to `retries` times with jittered exponential backoff, honouring Retry-After.
+    - With `hedge_after` set, a call still running after that many seconds is raised a second time
+      if a concurrency slot is free, and whichever finishes first wins.
+    """
+    def __init__(self, name, max_concurrency=4, requests_per_second=None, burst=None,
+                 retries=3, backoff=0.5, max_backoff=20.0, hedge_after=None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.rate_limiter = RateLimiter(requests_per_second, burst) if requests_per_second else None
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = {}  # event loop -> asyncio.Semaphore
+        self._hedge_pool = None
+        self._lock = threading.Lock()
+
+    def call(self, fn, *args, hedge=True, limit=True, **kwargs):
+        """
+        Runs `fn(*args, **kwargs)` under this provider's limits, retrying transient failures.
+        Pass limit=False when the caller already holds a slot (see slot()); such calls are never hedged.
+        """
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    if not limit:
+                        result = fn(*args, **kwargs)
+                    elif hedge and self.hedge_after is not None:
+                        result = self._hedged(fn, args, kwargs)
+                    else:
+                        result = self._limited(fn, args, kwargs)
+                    PROVIDER_REQUESTS.inc(provider=self.name, outcome="ok")
+                    return result
+                except Exception as e:
+                    if attempt == self.retries or not is_retryable(e):
+                        PROVIDER_REQUESTS.inc(provider=self.name, outcome="failed")
+                        raise
+                    delay = self._retry_delay(e, attempt)
+                    PROVIDER_REQUESTS.inc(provider=self.name, outcome="retried")
+                    print(f"{self.name} call failed ({e}); retrying in {delay:.1f}s")
+                    time.sleep(delay)
+        finally:
+            PROVIDER_SECONDS.observe(time.perf_counter() - start, provider=self.name)
+
+    async def acall(self, fn, *args, hedge=True, **kwargs):
+        """
+        Async version of call(); `fn` is a coroutine function.
+        """
+        import asyncio
+
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    if hedge and self.hedge_after is not None:
+                        result = await self._ahedged(fn, args, kwargs)
+                    else:
+                        result = await self._alimited(fn, args, kwargs)
+                    PROVIDER_REQUESTS.inc(provider=self.name, outcome="ok")
+                    return result
+                except Exception as e:
+                    if attempt == self.retries or not is_retryable(e):
+                        PROVIDER_REQUESTS.inc(provider=self.name, outcome="failed")
+                        raise
+                    delay = self._retry_delay(e, attempt)
+                    PROVIDER_REQUESTS.inc(provider=self.name, outcome="retried")
+                    print(f"{self.name} call failed ({e}); retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            PROVIDER_SECONDS.observe(time.perf_counter() - start, provider=self.name)
+
+    def slot(self):
+        """
+        Holds one concurrency slot (and a rate-limit token) for as long as a streamed response is read.
+        """
+        return _Slot(self)
+
+    def _limited(self, fn, args, kwargs):
+        with self._slots:
+            self._wait_for_rate_limit()
+            return fn(*args, **kwargs)
+
+    def _hedged(self, fn, args, kwargs):
+        pool = self._get_hedge_pool()
+        futures = [pool.submit(self._limited, fn, args, kwargs)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        # Only hedge when it doesn't have to queue behind other calls
+        if not done and self._slots.acquire(blocking=False):
+            self._slots.release()
+            PROVIDER_REQUESTS.inc(provider=self.name, outcome="hedged")
+            futures.append(pool.submit(self._limited, fn, args, kwargs))
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _alimited(self, fn, args, kwargs):
+        import asyncio
+
+        async with self._get_async_slots():
+            if self.rate_limiter is not None:
+                await asyncio.sleep(self.rate_limiter.reserve())
+            return await fn(*args, **kwargs)
+
+    async def _ahedged(self, fn, args, kwargs):
+        import asyncio
+
+        slots = self._get_async_slots()
+        tasks = [asyncio.ensure_future(self._alimited(fn, args, kwargs))]
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+        if not done and not slots.locked():
+            PROVIDER_REQUESTS.inc(provider=self.name, outcome="hedged")
+            tasks.append(asyncio.ensure_future(self._alimited(fn, args, kwargs)))
+
+        pending = set(tasks)
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The slower copy of a hedged call is no longer needed
+            for task in pending:
+                task.cancel()
+
+    def _wait_for_rate_limit(self):
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.reserve()
+            if delay:
+                time.sleep(delay)
+
+    def _retry_delay(self, error, attempt):
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return min(self.max_backoff, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+    def _get_hedge_pool(self):
+        with self._lock:
+            if self._hedge_pool is None:
+                # Room for every in-flight call plus its hedge
+                self._hedge_pool = ThreadPoolExecutor(max_workers=2 * self.max_concurrency,
+                                                      thread_name_prefix=f"{self.name}-call")
+            return self._hedge_pool
+
+    def _get_async_slots(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._async_slots:
+                self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+            return self._async_slots[loop]
+
+
+class _Slot:
+    def __init__(self, provider):
+        self.provider = provider
+
+    def __enter__(self):
+        self.provider._slots.acquire()
+        self.provider._wait_for_rate_limit()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.provider._slots.release()
+
+
+class ClientFactory:
+    """
+    Builds a client with `build()` on first call and returns the same one afterwards, so declaring a client
+    at module level costs nothing at import time and doesn't need credentials until it is used.
+    """
+    def __init__(self, build):
+        self._build = build
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._build()
+        return self._client
+
+
+def require_api_key(env_var, provider_name):
+    api_key = os.getenv(env_var)
+    if not api_key:
+        raise ValueError(f"{provider_name} API key not found in environment variables.")
+    return api_key
+
+
+class StoryClient:
+    """
+    Chat completions through one pooled OpenAI client per process.
+    The SDK's own retries are turned off so `provider` decides about retries and hedging.
+    """
+    def __init__(self, api_key, base_url=None, provider=None, timeout=120.0):
+        import httpx
+        from openai import OpenAI
+
+        self.provider = provider or Provider("openai")
+        self._limits = httpx.Limits(max_connections=2 * self.provider.max_concurrency,
+                                    max_keepalive_connections=self.provider.max_concurrency)
+        self._timeout = httpx.Timeout(timeout, connect=10.0)
+        self._options = {"api_key": api_key, "base_url": base_url, "max_retries": 0}
+        self.client = OpenAI(http_client=httpx.Client(limits=self._limits, timeout=self._timeout), **self._options)
+        self._async_client = None
+
+    def complete(self, **request):
+        """
+        Creates a chat completion and returns the text of the first choice.
+        """
+        response = self.provider.call(self.client.chat.completions.create, **request)
+        return response.choices[0].message.content
+
+    def stream(self, **request):
+        """
+        Yields the text deltas of a streamed chat completion. Opening the stream is retried;
+        once text has been yielded a failure is raised to the caller. Never hedged.
+        """
+        with self.provider.slot():
+            response = self.provider.call(self.client.chat.completions.create, limit=False, stream=True, **request)
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def acomplete(self, **request):
+        response = await self.provider.acall(self._get_async_client().chat.completions.create, **request)
+        return response.choices[0].message.content
+
+    def _get_async_client(self):
+        if self._async_client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(http_client=httpx.AsyncClient(limits=self._limits, timeout=self._timeout),
+                                             **self._options)
+        return self._async_client
+
+
+class SpeechClient:
+    """
+    ElevenLabs text-to-speech over a keep-alive connection pool sized to the provider's concurrency.
+    """
+    def __init__(self, api_key, base_url="https://api.elevenlabs.io/v1", provider=None, timeout=120.0):
+        import httpx
+
+        self.base_url = base_url.rstrip("/")
+        self.provider = provider or Provider("elevenlabs")
+        self._headers = {"Accept": "audio/mpeg", "Content-Type": "application/json", "xi-api-key": api_key}
+        self._limits = httpx.Limits(max_connections=2 * self.provider.max_concurrency,
+                                    max_keepalive_connections=self.provider.max_concurrency)
+        self._timeout = httpx.Timeout(timeout, connect=10.0)
+        self.client = httpx.Client(headers=self._headers, limits=self._limits, timeout=self._timeout)
+        self._async_client = None
+
+    def speech(self, text, voice_id, model_id="eleven_multilingual_v2", voice_settings=None):
+        """
+        Returns the synthesized audio for `text` as bytes.
+        """
+        return self.provider.call(self._post, text, voice_id, model_id, voice_settings)
+
+    async def aspeech(self, text, voice_id, model_id="eleven_multilingual_v2", voice_settings=None):
+        return await self.provider.acall(self._apost, text, voice_id, model_id, voice_settings)
+
+    def _post(self, text, voice_id, model_id, voice_settings):
+        url, data = self._request(text, voice_id, model_id, voice_settings)
+        return _check(self.client.post(url, json=data))
+
+    async def _apost(self, text, voice_id, model_id, voice_settings):
+        if self._async_client is None:
+            import httpx
+
+            self._async_client = httpx.AsyncClient(headers=self._headers, limits=self._limits, timeout=self._timeout)
+        url, data = self._request(text, voice_id, model_id, voice_settings)
+        return _check(await self._async_client.post(url, json=data))
+
+    def _request(self, text, voice_id, model_id, voice_settings):
+        data = {"text": text, "model_id": model_id}
+        if voice_settings is not None:
+            data["voice_settings"] = voice_settings
+        return f"{self.base_url}/text-to-speech/{voice_id}/stream", data
+
+
+def is_retryable(error):
+    import httpx
+
+    if isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and getattr(error, "response", None) is not None:
+        status_code = getattr(error.response, "status_code", None)
+    if status_code is not None:
+        return status_code in RETRY_STATUSES
+    # The OpenAI SDK wraps connection failures and timeouts in its own exception types
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise ProviderError(f"ElevenLabs TTS API Error {response.status_code}: {response.text}", response)
+    return response.content
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
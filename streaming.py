@@ -0,0 +1,204 @@
+import io
+import queue
+import re
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from pydub import AudioSegment
+from pydub.utils import ratio_to_db
+
+# A sentence ends with . ! or ? (optionally followed by closing quotes/brackets) and whitespace
+SENTENCE_END = re.compile(r"""[.!?]+["'”’)\]]*\s+""")
+MIN_CHUNK_CHARS = 120  # Short sentences are merged so each TTS request has enough context
+TTS_LOOKAHEAD = 2  # Sentences synthesized ahead of the one being mixed
+
+PCM_FORMATS = {1: "u8", 2: "s16le", 4: "s32le"}
+
+
+def sentence_chunks(text_deltas, min_chars=MIN_CHUNK_CHARS):
+    """
+    Turns a stream of text fragments (e.g. LLM deltas) into sentence-aligned chunks of at least `min_chars`.
+    """
+    buffer = ""
+    for delta in text_deltas:
+        buffer += delta
+        # A single delta may hold many sentences (e.g. a cached story), so cut every chunk that is long enough
+        cut = 0
+        for match in SENTENCE_END.finditer(buffer):
+            chunk = buffer[cut:match.end()].strip()
+            if len(chunk) >= min_chars:
+                yield chunk
+                cut = match.end()
+        buffer = buffer[cut:]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class Mp3Encoder:
+    """
+    Encodes raw PCM to MP3 incrementally through a long-running ffmpeg process.
+    write() returns whatever MP3 frames are ready so far; close() flushes the rest.
+    """
+    def __init__(self, sample_width, frame_rate, channels, bitrate="128k"):
+        command = [
+            AudioSegment.converter, "-loglevel", "error",
+            "-f", PCM_FORMATS[sample_width], "-ar", str(frame_rate), "-ac", str(channels), "-i", "pipe:0",
+            "-f", "mp3", "-b:a", bitrate, "-write_xing", "0", "-id3v2_version", "0",
+            "-flush_packets", "1", "pipe:1",
+        ]
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._output = queue.Queue()
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+
+    def write(self, pcm):
+        self._process.stdin.write(pcm)
+        self._process.stdin.flush()
+        return self._drain()
+
+    def abort(self):
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+
+    def close(self):
+        self._process.stdin.close()
+        self._reader.join()
+        self._process.wait()
+        if self._process.returncode != 0:
+            raise Exception(f"ffmpeg MP3 encoder exited with code {self._process.returncode}")
+        return self._drain()
+
+    def _read_output(self):
+        for chunk in iter(lambda: self._process.stdout.read1(4096), b""):
+            self._output.put(chunk)
+
+    def _drain(self):
+        chunks = []
+        while True:
+            try:
+                chunks.append(self._output.get_nowait())
+            except queue.Empty:
+                return b"".join(chunks)
+
+
+class StreamingMixer:
+    """
+    Mixes narration chunks over a looped background bed as they arrive and returns encoded MP3 bytes.
+
+    Follows the same rules as mix_audio: the bed sits `gain_offset_db` below the narration,
+    runs `tail_ms` past the end of the narration, and the last `fade_ms` are faded out.
+    Since the final narration level isn't known up front, the gain tracks the level of the narration heard so far.
+    Only the audio that the fade will reach into is held back until finish().
+    """
+    def __init__(self, background_music, music_dBFS=None, gain_offset_db=-12, tail_ms=5000, fade_ms=6000, bitrate="128k"):
+        self.background_music = background_music.set_sample_width(2)
+        self.music_dBFS = music_dBFS if music_dBFS is not None else self.background_music.dBFS
+        self.gain_offset_db = gain_offset_db
+        self.tail_ms = tail_ms
+        self.fade_ms = fade_ms
+        self.bitrate = bitrate
+        self._bed_position = 0
+        self._narration_square_sum = 0.0
+        self._narration_samples = 0
+        self._pending = None
+        self._encoder = None
+        self._format = None
+
+    def add(self, narration):
+        self._track_level(narration)
+        bed = self._next_bed(len(narration)) + self._gain()
+        return self._emit(bed.overlay(narration))
+
+    def finish(self):
+        tail = self._next_bed(self.tail_ms) + self._gain()
+        mixed = (self._pending + tail) if self._pending is not None else tail
+        self._pending = None
+        data = self._encode(mixed.fade_out(self.fade_ms))
+        return data + self._encoder.close()
+
+    def abort(self):
+        # Used when the listener goes away before the story is finished
+        if self._encoder is not None:
+            self._encoder.abort()
+
+    def _emit(self, mixed):
+        # Keep the last fade_ms back; everything before it is final and can be encoded now
+        if self._pending is not None:
+            mixed = self._pending + mixed
+        hold_ms = max(0, self.fade_ms - self.tail_ms)
+        if len(mixed) <= hold_ms:
+            self._pending = mixed
+            return b""
+        self._pending = mixed[len(mixed) - hold_ms:]
+        return self._encode(mixed[:len(mixed) - hold_ms])
+
+    def _encode(self, segment):
+        if self._encoder is None:
+            self._format = (segment.sample_width, segment.frame_rate, segment.channels)
+            self._encoder = Mp3Encoder(*self._format, bitrate=self.bitrate)
+        sample_width, frame_rate, channels = self._format
+        segment = segment.set_sample_width(sample_width).set_frame_rate(frame_rate).set_channels(channels)
+        return self._encoder.write(segment.raw_data)
+
+    def _track_level(self, narration):
+        narration = narration.set_sample_width(2)
+        rms = narration.rms
+        samples = int(narration.frame_count()) * narration.channels
+        self._narration_square_sum += rms * rms * samples
+        self._narration_samples += samples
+
+    def _gain(self):
+        if not self._narration_samples:
+            return 0
+        rms = (self._narration_square_sum / self._narration_samples) ** 0.5
+        if not rms:
+            return 0
+        narration_dBFS = ratio_to_db(rms / self.background_music.max_possible_amplitude)
+        return narration_dBFS - self.music_dBFS + self.gain_offset_db
+
+    def _next_bed(self, duration_ms):
+        # Loop the background track, continuing where the previous chunk stopped
+        pieces = []
+        remaining = duration_ms
+        while remaining > 0:
+            piece = self.background_music[self._bed_position:self._bed_position + remaining]
+            pieces.append(piece)
+            remaining -= len(piece)
+            self._bed_position = (self._bed_position + len(piece)) % len(self.background_music)
+        return sum(pieces[1:], pieces[0]) if pieces else AudioSegment.silent(0)
+
+
+def stream_story_audio(text_deltas, synthesize, background_music, **mixer_options):
+    """
+    Yields MP3 bytes for a story while it is still being written.
+
+    `text_deltas` is an iterable of story text fragments and `synthesize(text)` returns encoded
+    speech audio for one chunk. Up to TTS_LOOKAHEAD chunks are synthesized ahead of the mixer.
+    """
+    mixer = StreamingMixer(background_music, **mixer_options)
+    pending = deque()
+    finished = False
+    try:
+        with ThreadPoolExecutor(max_workers=TTS_LOOKAHEAD, thread_name_prefix="stream-tts") as executor:
+            for chunk in sentence_chunks(text_deltas):
+                pending.append(executor.submit(synthesize, chunk))
+                if len(pending) >= TTS_LOOKAHEAD:
+                    data = mixer.add(_decode(pending.popleft().result()))
+                    if data:
+                        yield data
+            while pending:
+                data = mixer.add(_decode(pending.popleft().result()))
+                if data:
+                    yield data
+        yield mixer.finish()
+        finished = True
+    finally:
+        if not finished:
+            mixer.abort()
+
+
+def _decode(audio_bytes):
+    return AudioSegment.from_file(io.BytesIO(audio_bytes))
@@ -0,0 +1,39 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from artifacts import ArtifactStore
+
+
+def commit_many(store, worker, count):
+    ids = []
+    for i in range(count):
+        # Half the files repeat another worker's content, so the dedupe path races too
+        content = f"{worker % 2}-{i % 10}" if i % 2 else f"{worker}-{i}"
+        path = os.path.join(store.job_dir(f"{worker}-{i}"), "audio.mp3")
+        with open(path, "w") as f:
+            f.write(content)
+        ids.append(store.commit(path))
+        store.release_job(f"{worker}-{i}")
+    return ids
+
+
+def test_stores_sharing_a_root_sweep_without_failing_commits(tmp_path):
+    # Separate instances have separate locks, like separate processes; every commit sweeps and evicts
+    stores = [ArtifactStore(str(tmp_path), ttl_seconds=1, max_bytes=10, gc_interval=0) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=len(stores)) as executor:
+        futures = [executor.submit(commit_many, store, worker, 200) for worker, store in enumerate(stores)]
+        ids = [artifact_id for future in futures for artifact_id in future.result()]
+    assert len(ids) == 800
+
+
+def test_commit_dedupes_and_keeps_the_file(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    first, second = (os.path.join(store.job_dir(name), "audio.mp3") for name in ("a", "b"))
+    for path in (first, second):
+        with open(path, "wb") as f:
+            f.write(b"same audio")
+    artifact_id = store.commit(first)
+    assert store.commit(second) == artifact_id
+    assert not os.path.exists(second)
+    with open(store.path(artifact_id), "rb") as f:
+        assert f.read() == b"same audio"
@@ -0,0 +1,43 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+from cache import ResultCache, cache_key
+
+
+def put_many(result_cache, worker, count):
+    for i in range(count):
+        # Shared keys make the writers replace and evict each other's files
+        result_cache.put(cache_key("tts", i % 20), f"{worker}-{i}".encode() * 50)
+
+
+def test_caches_sharing_a_folder_sweep_without_failing_puts(tmp_path):
+    # Separate instances stand in for separate processes; every put sweeps and evicts
+    caches = [ResultCache(str(tmp_path), max_bytes=1000, gc_interval=0) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=len(caches)) as executor:
+        futures = [executor.submit(put_many, result_cache, worker, 200) for worker, result_cache in enumerate(caches)]
+        for future in futures:
+            future.result()
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(cache.TMP_SUFFIX)]
+
+
+def test_garbage_collection_leaves_files_being_written(tmp_path):
+    result_cache = ResultCache(str(tmp_path), max_bytes=0)
+    in_flight = tmp_path / "ab" / f"abc{cache.TMP_SUFFIX}"
+    in_flight.parent.mkdir()
+    in_flight.write_bytes(b"partial")
+    result_cache.put(cache_key("story"), b"a story")
+    result_cache.collect_garbage()
+    assert in_flight.exists()
+
+
+def test_failed_disk_write_is_not_an_error(tmp_path, monkeypatch, capsys):
+    result_cache = ResultCache(str(tmp_path))
+
+    def no_space(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(cache.tempfile, "mkstemp", no_space)
+    result_cache.put(cache_key("story"), b"a story")
+    assert "could not write cache entry" in capsys.readouterr().out
+    assert result_cache.get(cache_key("story")) == b"a story"  # Still served from memory
@@ -0,0 +1,83 @@
+import io
+import threading
+from collections import Counter
+
+import pytest
+from pydub import AudioSegment
+
+from chunked_tts import split_text, stitch, synthesize_chunks
+from fake_providers import fake_story, start_fake_server
+from providers import Provider, SpeechClient
+
+SECONDS_PER_WORD = 0.1
+
+
+def speech_client(**server_options):
+    server, base_url = start_fake_server(seconds_per_word=SECONDS_PER_WORD, **server_options)
+    # No provider retries, so a failed request reaches synthesize_chunks' own per-chunk retries
+    client = SpeechClient("fake", base_url, Provider("elevenlabs", max_concurrency=4, retries=0))
+    return server, client
+
+
+@pytest.fixture
+def fake_tts(request):
+    server, client = speech_client(**getattr(request, "param", {}))
+    yield client
+    server.shutdown()
+    server.server_close()
+
+
+def duration_ms(data):
+    return len(AudioSegment.from_file(io.BytesIO(data)))
+
+
+def test_split_text_respects_budget_and_keeps_every_word():
+    run_on = " ".join(["nothing"] * 120)  # A single sentence longer than the smaller budgets
+    text = f"{fake_story(300)}\n\n{run_on}\n\n\n{fake_story(40)}  Is anyone there?  No.\n\n"
+    for max_chars in (40, 200, 1000):
+        chunks = split_text(text, max_chars)
+        assert all(len(chunk) <= max_chars for chunk in chunks)
+        assert " ".join(chunks).split() == text.split()
+
+
+@pytest.mark.parametrize("fake_tts", [{"tts_seconds_per_char": 0.002}], indirect=True)
+def test_results_keep_chunk_order_when_chunks_finish_out_of_order(fake_tts):
+    # The first chunk is by far the longest, so the fake server takes longest to answer it
+    chunks = [fake_story(150), fake_story(5), fake_story(10), fake_story(15)]
+    finished = []
+    lock = threading.Lock()
+
+    def synthesize(chunk):
+        audio = fake_tts.speech(chunk, "voice")
+        with lock:
+            finished.append(chunks.index(chunk))
+        return audio
+
+    results = synthesize_chunks(chunks, synthesize, max_workers=4, retries=0)
+    assert finished[-1] == 0
+    assert [round(duration_ms(audio) / 1000 / SECONDS_PER_WORD) for audio in results] == [150, 5, 10, 15]
+
+
+@pytest.mark.parametrize("fake_tts", [{"fail_first": 1}], indirect=True)
+def test_one_failed_chunk_is_retried_on_its_own(fake_tts):
+    chunks = [fake_story(words) for words in (5, 6, 7, 8)]
+    calls = Counter()
+
+    def synthesize(chunk):
+        calls[chunk] += 1
+        return fake_tts.speech(chunk, "voice")
+
+    results = synthesize_chunks(chunks, synthesize, max_workers=2, retries=1, backoff=0)
+    assert len(results) == len(chunks)
+    assert sorted(calls.values()) == [1, 1, 1, 2]
+
+
+def test_stitch_puts_silence_between_chunks(fake_tts):
+    audio_chunks = [fake_tts.speech(fake_story(words), "voice") for words in (5, 10, 15)]
+    lengths = [duration_ms(audio) for audio in audio_chunks]
+
+    stitched = stitch(audio_chunks, silence_ms=300)
+    assert len(stitched) == sum(lengths) + 2 * 300
+    assert stitched[lengths[0]:lengths[0] + 300].rms == 0
+    assert stitched[lengths[0] + 300:lengths[0] + 600].rms > 0
+    assert len(stitch(audio_chunks, silence_ms=0)) == sum(lengths)
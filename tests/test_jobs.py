@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from jobs import JobQueue, QueueFullError
+
+
+def blocking_pipeline():
+    started, release = threading.Event(), threading.Event()
+
+    def pipeline(job):
+        started.set()
+        release.wait(5)
+        return job.params["name"]
+
+    return pipeline, started, release
+
+
+def test_submit_raises_queue_full_at_max_queue_depth():
+    pipeline, started, release = blocking_pipeline()
+    queue = JobQueue(pipeline, max_workers=1, max_queue_depth=2)
+    running = queue.submit({"name": "running"})
+    assert started.wait(5)
+    waiting = [queue.submit({"name": f"waiting {i}"}) for i in range(2)]
+    assert queue.stats() == {"queued": 2, "running": 1, "max_queue_depth": 2}
+
+    with pytest.raises(QueueFullError):
+        queue.submit({"name": "one too many"})
+
+    release.set()
+    queue.shutdown()
+    assert [job.status for job in [running] + waiting] == ["done"] * 3
+    assert waiting[1].result == "waiting 1"
+    assert queue.stats()["queued"] == 0
+
+
+def test_failed_pipeline_marks_the_job_failed_with_its_error():
+    def pipeline(job):
+        raise ValueError("TTS provider unavailable")
+
+    queue = JobQueue(pipeline)
+    job = queue.submit({})
+    queue.shutdown()
+    assert job.status == "failed"
+    assert job.result is None
+    assert job.to_dict()["error"] == "TTS provider unavailable"
+    assert job.finished_at >= job.started_at >= job.created_at
+
+
+def test_only_the_oldest_finished_jobs_are_evicted():
+    pipeline, started, release = blocking_pipeline()
+    queue = JobQueue(pipeline, max_workers=1, keep_finished=2)
+    running = queue.submit({"name": "running"})
+    assert started.wait(5)
+    done = [queue.add_done({}, f"artifact {i}") for i in range(4)]
+
+    assert [queue.get(job.id) for job in done] == [None, None, done[2], done[3]]
+    assert queue.get(running.id) is running  # Unfinished jobs are never evicted
+    release.set()
+    queue.shutdown()
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from pydub import AudioSegment
+
+import mixing
+from mixing import mix_files, mix_tracks
+from music_library import MusicTrack
+
+
+def synthetic_audio(seconds, frame_rate, channels, amplitude, seed):
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * frame_rate)
+    t = np.arange(frames) / frame_rate
+    # Noise under a slow envelope, so the level varies like speech or music does
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 0.5 * t)
+    samples = rng.standard_normal((frames, channels)) * amplitude * envelope[:, None]
+    samples = np.clip(samples, -32768, 32767).astype(np.int16)
+    return AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=frame_rate, channels=channels)
+
+
+def pydub_mix(tts_audio, background_music, gain_offset_db=-12, tail_ms=5000, fade_ms=6000):
+    # The overlay/gain/fade chain mix_audio used before the NumPy engine
+    total_duration = len(tts_audio) + tail_ms
+    background_music = (background_music * ((total_duration // len(background_music)) + 1))[:total_duration]
+    background_music += (tts_audio.dBFS - background_music.dBFS + gain_offset_db)
+    mixed_audio = background_music.overlay(tts_audio)
+    return mixed_audio.fade_out(fade_ms)
+
+
+@pytest.fixture(scope="module")
+def track():
+    return MusicTrack("synthetic", synthetic_audio(4, 44100, 2, 4000, seed=1))
+
+
+@pytest.mark.parametrize("seconds, frame_rate, channels", [
+    (3, 44100, 1),  # Shorter than the track
+    (9.5, 44100, 1),  # Longer, so the track loops
+    (6, 22050, 1),  # Narration at another rate than the music
+    (5, 44100, 2),
+])
+def test_mix_matches_the_pydub_chain(track, seconds, frame_rate, channels):
+    tts_audio = synthetic_audio(seconds, frame_rate, channels, 9000, seed=2)
+    mixed = mix_tracks(tts_audio, track)
+    expected = pydub_mix(tts_audio, track.audio)
+    assert (mixed.frame_rate, mixed.channels, mixed.sample_width) == \
+        (expected.frame_rate, expected.channels, expected.sample_width)
+    assert mixed.raw_data == expected.raw_data
+
+
+def test_mix_options_match_the_pydub_chain(track):
+    tts_audio = synthetic_audio(3, 44100, 1, 9000, seed=3)
+    mixed = mix_tracks(tts_audio, track, gain_offset_db=-6, tail_ms=2000, fade_ms=1500)
+    assert mixed.raw_data == pydub_mix(tts_audio, track.audio, gain_offset_db=-6, tail_ms=2000, fade_ms=1500).raw_data
+
+
+def decode(path):
+    audio = AudioSegment.from_file(path)
+    return np.frombuffer(audio.raw_data, dtype=np.int16).astype(np.int32), audio
+
+
+@pytest.mark.parametrize("frame_rate, duck_db", [(44100, 0), (22050, 0), (44100, 6)])
+def test_block_mix_matches_the_in_memory_mix(tmp_path, monkeypatch, track, frame_rate, duck_db):
+    # Small, odd-sized blocks so the bed, resampling, ducking and fade all cross block boundaries
+    monkeypatch.setattr(mixing, "BLOCK_FRAMES", 5003)
+    monkeypatch.setattr(mixing, "_mix_in_memory", lambda *args: pytest.fail("took the in-memory fallback"))
+    tts_path = str(tmp_path / "narration.wav")
+    synthetic_audio(8, frame_rate, 1, 9000, seed=4).export(tts_path, format="wav")
+
+    streamed_path, memory_path = str(tmp_path / "streamed.mp3"), str(tmp_path / "memory.mp3")
+    narration_seconds, mixed_seconds = mix_files(tts_path, track, streamed_path, duck_db=duck_db)
+    expected = mix_tracks(AudioSegment.from_file(tts_path), track, duck_db=duck_db)
+    expected.export(memory_path, format="mp3")
+
+    streamed, streamed_audio = decode(streamed_path)
+    memory, _ = decode(memory_path)
+    assert len(streamed) == len(memory)
+    assert np.abs(streamed - memory).max() <= 2
+    assert (narration_seconds, mixed_seconds) == (8.0, len(expected) / 1000)
+    assert (streamed_audio.frame_rate, streamed_audio.channels) == (expected.frame_rate, expected.channels)
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from fake_providers import start_fake_server
+from providers import Provider, ProviderError, SpeechClient
+
+
+@pytest.fixture
+def speech_client():
+    servers = []
+
+    def build(retries=3, max_backoff=20.0, **server_options):
+        server, base_url = start_fake_server(**server_options)
+        servers.append(server)
+        client = SpeechClient("fake", base_url, Provider("elevenlabs", retries=retries, backoff=0,
+                                                         max_backoff=max_backoff))
+        # Count the HTTP requests each speech() call makes
+        post = client._post
+        client.requests = 0
+
+        def counted_post(*args):
+            client.requests += 1
+            return post(*args)
+
+        client._post = counted_post
+        return client
+
+    yield build
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_errors_are_retried(speech_client, status):
+    client = speech_client(fail_first=2, fail_status=status)
+    assert client.speech("Hello there.", "voice")
+    assert client.requests == 3
+
+
+def test_calls_succeed_despite_random_failures(speech_client):
+    client = speech_client(retries=8, error_rate=0.3, seed=1)
+    for _ in range(20):
+        assert client.speech("Hello there.", "voice")
+    assert client.requests > 20
+
+
+def test_retry_after_is_honoured(speech_client):
+    client = speech_client(fail_first=1, fail_status=429, retry_after=0.3)
+    start = time.perf_counter()
+    client.speech("Hello there.", "voice")
+    assert time.perf_counter() - start >= 0.3
+
+
+def test_retry_after_is_capped_by_max_backoff(speech_client):
+    client = speech_client(max_backoff=0.05, fail_first=1, fail_status=503, retry_after=30)
+    start = time.perf_counter()
+    client.speech("Hello there.", "voice")
+    assert time.perf_counter() - start < 5
+
+
+@pytest.mark.parametrize("status", [400, 401, 422])
+def test_client_errors_are_not_retried(speech_client, status):
+    client = speech_client(fail_first=1, fail_status=status)
+    with pytest.raises(ProviderError) as error:
+        client.speech("Hello there.", "voice")
+    assert error.value.status_code == status
+    assert client.requests == 1
+
+
+def test_gives_up_after_the_configured_retries(speech_client):
+    client = speech_client(retries=2, fail_first=10)
+    with pytest.raises(ProviderError) as error:
+        client.speech("Hello there.", "voice")
+    assert error.value.status_code == 503
+    assert client.requests == 3
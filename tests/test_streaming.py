@@ -0,0 +1,41 @@
+import io
+
+import pytest
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from fake_providers import fake_story, start_fake_server
+from providers import SpeechClient, StoryClient
+from streaming import sentence_chunks, stream_story_audio
+
+SECONDS_PER_WORD = 0.05
+
+
+@pytest.fixture
+def fake_server():
+    server, base_url = start_fake_server(seconds_per_word=SECONDS_PER_WORD)
+    yield base_url
+    server.shutdown()
+    server.server_close()
+
+
+def test_one_delta_with_many_sentences_is_cut_into_several_chunks():
+    story = fake_story(200)
+    chunks = list(sentence_chunks([story], min_chars=120))
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 120 for chunk in chunks[:-1])
+    assert " ".join(chunks).split() == story.split()
+
+
+def test_story_streams_as_decodable_mp3(fake_server):
+    story_client = StoryClient("fake", fake_server)
+    speech_client = SpeechClient("fake", fake_server)
+    deltas = story_client.stream(model="fake", messages=[{"role": "user", "content": "A story"}], max_tokens=60)
+    music = Sine(110).to_audio_segment(duration=3000, volume=-20).set_channels(2).set_frame_rate(44100)
+
+    data = b"".join(stream_story_audio(deltas, lambda text: speech_client.speech(text, "voice"), music))
+
+    audio = AudioSegment.from_file(io.BytesIO(data), format="mp3")
+    # 60 words of narration, plus the music tail after it
+    assert len(audio) / 1000 > 60 * SECONDS_PER_WORD
+    assert audio.rms > 0
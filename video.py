@@ -0,0 +1,147 @@
+import os
+import random
+import subprocess
+import threading
+from collections import namedtuple
+
+import imageio_ffmpeg
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+Slide = namedtuple("Slide", ["image_path", "start", "end"])
+
+
+class FrameCache:
+    """
+    Decodes and letterboxes each image once per video size, however many times it appears in a slideshow.
+    """
+    def __init__(self):
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def get(self, image_path, video_size):
+        key = (os.path.abspath(image_path), tuple(video_size))
+        with self._lock:
+            frame = self._frames.get(key)
+        if frame is None:
+            frame = letterbox(image_path, video_size)
+            with self._lock:
+                self._frames[key] = frame
+        return frame
+
+
+def letterbox(image_path, video_size):
+    """
+    Scales the image to fit inside `video_size` (height first, like the old moviepy resize) and centers it on black.
+    """
+    width, height = video_size
+    with Image.open(image_path) as image:
+        image = image.convert("RGB")
+        scale = min(height / image.height, width / image.width)
+        resized = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    x = (width - resized.width) // 2
+    y = (height - resized.height) // 2
+    frame[y:y + resized.height, x:x + resized.width] = np.asarray(resized)
+    return frame
+
+
+def plan_timeline(audio_duration, image_files, display_duration_range=(30, 45), transition_duration=2, rng=random):
+    """
+    Picks images and random display durations until the slideshow covers `audio_duration`.
+    Consecutive slides overlap by `transition_duration`, the same as concatenating with padding=-transition_duration.
+    """
+    slides = []
+    start = 0.0
+    while not slides or slides[-1].end < audio_duration:
+        duration = rng.uniform(*display_duration_range)
+        slides.append(Slide(rng.choice(image_files), start, start + duration))
+        start += duration - transition_duration
+    return slides
+
+
+class Slideshow:
+    """
+    Renders a planned timeline frame by frame. Each slide fades in from and out to black over
+    `transition_duration`; where two slides overlap the later one is drawn, as moviepy's "compose" did.
+    """
+    def __init__(self, slides, video_size=(1280, 720), transition_duration=2, frame_cache=None):
+        self.slides = slides
+        self.video_size = video_size
+        self.transition_duration = transition_duration
+        self.frame_cache = frame_cache or FrameCache()
+
+    def frame_at(self, t):
+        index = self._slide_index(t, 0)
+        return self._render(self.slides[index], t)
+
+    def frames(self, duration, fps=24):
+        """
+        Yields raw RGB24 frames for [0, duration). Frames between transitions reuse the cached image bytes.
+        """
+        index = 0
+        static_bytes = {}
+        for frame_number in range(int(duration * fps)):
+            t = frame_number / fps
+            index = self._slide_index(t, index)
+            slide = self.slides[index]
+            if self._fade(slide, t) >= 1.0:
+                if slide.image_path not in static_bytes:
+                    static_bytes[slide.image_path] = self.frame_cache.get(slide.image_path, self.video_size).tobytes()
+                yield static_bytes[slide.image_path]
+            else:
+                yield self._render(slide, t).tobytes()
+
+    def _slide_index(self, t, index):
+        # The latest slide that has started is on top; slides are sorted by start time
+        while index + 1 < len(self.slides) and self.slides[index + 1].start <= t:
+            index += 1
+        return index
+
+    def _fade(self, slide, t):
+        if not self.transition_duration:
+            return 1.0
+        return max(0.0, min(1.0, (t - slide.start) / self.transition_duration,
+                            (slide.end - t) / self.transition_duration))
+
+    def _render(self, slide, t):
+        frame = self.frame_cache.get(slide.image_path, self.video_size)
+        fade = self._fade(slide, t)
+        if fade >= 1.0:
+            return frame
+        return (frame * fade).astype(np.uint8)
+
+
+def list_images(images_folder):
+    image_files = [os.path.join(images_folder, file) for file in os.listdir(images_folder)
+                   if file.lower().endswith(IMAGE_EXTENSIONS)]
+    if not image_files:
+        raise ValueError("No image files found in the specified images folder.")
+    return image_files
+
+
+def render_slideshow(audio_path, audio_duration, slideshow, output_video_path, fps=24, preset="medium"):
+    """
+    Pipes the slideshow frames straight into one ffmpeg process that also muxes in the audio.
+    """
+    width, height = slideshow.video_size
+    command = [
+        imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "pipe:0",
+        "-i", audio_path,
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "libx264", "-preset", preset, "-tune", "stillimage", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-t", f"{audio_duration:.3f}",
+        output_video_path,
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE)
+    try:
+        for frame in slideshow.frames(audio_duration, fps):
+            process.stdin.write(frame)
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
+    if process.wait() != 0:
+        raise Exception(f"ffmpeg exited with code {process.returncode} while rendering {output_video_path}")
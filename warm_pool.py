@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+
+class WarmPool:
+    """
+    Keeps up to `size` finished results ready per bucket (e.g. voice and story length) so requests that
+    don't ask for anything specific can be served right away.
+
+    `produce(bucket)` runs the full pipeline and returns the result, e.g. an artifact id. Whenever a result
+    is taken, the bucket is refilled on background threads. Results older than `max_age` seconds, or that
+    `is_valid(result)` rejects (say, an artifact that was garbage collected), are dropped instead of served.
+    """
+    def __init__(self, produce, buckets, size=2, max_age=6 * 3600, is_valid=None, workers=1):
+        self._produce = produce
+        self.size = size
+        self.max_age = max_age
+        self._is_valid = is_valid
+        self._ready = {bucket: deque() for bucket in buckets}  # bucket -> (created_at, result), oldest first
+        self._pending = {bucket: 0 for bucket in buckets}
+        self._hits = 0
+        self._misses = 0
+        self._started = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warm-pool")
+
+    def start(self):
+        """
+        Starts filling every bucket. Only the first call does anything, so it is safe to call on every request.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for bucket in self._ready:
+            self._refill(bucket)
+
+    def take(self, bucket):
+        """
+        Returns a ready result for `bucket` and schedules its replacement, or None when the pool is empty.
+        """
+        if bucket not in self._ready:
+            return None
+        with self._lock:
+            self._evict_stale(bucket)
+            result = None
+            while self._ready[bucket] and result is None:
+                _, result = self._ready[bucket].popleft()
+                if self._is_valid is not None and not self._is_valid(result):
+                    result = None
+            if result is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        metrics.record_cache("pool", result is not None)
+        self._refill(bucket)
+        return result
+
+    def stats(self):
+        with self._lock:
+            for bucket in self._ready:
+                self._evict_stale(bucket)
+            lookups = self._hits + self._misses
+            return {
+                "ready": {_label(bucket): len(entries) for bucket, entries in self._ready.items()},
+                "pending": {_label(bucket): count for bucket, count in self._pending.items()},
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _refill(self, bucket):
+        with self._lock:
+            missing = self.size - len(self._ready[bucket]) - self._pending[bucket]
+            self._pending[bucket] += max(0, missing)
+        for _ in range(missing):
+            self._executor.submit(self._fill_one, bucket)
+
+    def _fill_one(self, bucket):
+        try:
+            result = self._produce(bucket)
+        except Exception as e:
+            # Not retried here; the next take() schedules another attempt
+            print(f"Warm pool refill for {bucket} failed: {e}")
+            result = None
+        with self._lock:
+            self._pending[bucket] -= 1
+            if result is not None:
+                self._ready[bucket].append((time.time(), result))
+
+    def _evict_stale(self, bucket):
+        entries = self._ready[bucket]
+        while entries and time.time() - entries[0][0] > self.max_age:
+            entries.popleft()
+
+
+def _label(bucket):
+    # Buckets are usually tuples, which JSON can't use as keys
+    return ":".join(map(str, bucket)) if isinstance(bucket, tuple) else str(bucket)